@@ -0,0 +1,67 @@
+# bench_article_extraction.py
+# Parse time and peak memory of the streaming ArticleHTMLExtractor versus the
+# previous path (BeautifulSoup over the whole page, str() of .post-body, then
+# a second BeautifulSoup pass to build markup).
+#
+#   python benchmarks/bench_article_extraction.py [saved_pages_dir]
+#
+# Without a directory, synthetic Blogger-style pages are generated.
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core
+from bs4 import BeautifulSoup
+
+CHUNK_SIZE = 8192 # Roughly what aiter_text yields per read
+
+def legacy_extract(page):
+    soup = BeautifulSoup(page, 'lxml')
+    img_tag = soup.find("meta", property="og:image")
+    post_body = soup.select_one('.post-body')
+    body = str(post_body) if post_body else ''
+    markup = body.replace('<p>', '').replace('</p>', '\n').replace('<br>', '\n').replace('<br/>', '\n')
+    markup = markup.replace('<b>', '[b]').replace('</b>', '[/b]').replace('<i>', '[i]').replace('</i>', '[/i]')
+    soup = BeautifulSoup(markup, 'lxml')
+    for img in soup.find_all('img'): img.decompose()
+    for a in soup.find_all('a'): a.replace_with(f"[ref={a.get('href', '#')}][color=0000ff]{a.get_text()}[/color][/ref]")
+    return (img_tag['content'] if img_tag else None), soup.get_text()
+
+def streaming_extract(page):
+    extractor = core.ArticleHTMLExtractor()
+    for start in range(0, len(page), CHUNK_SIZE):
+        extractor.feed(page[start:start + CHUNK_SIZE])
+        if extractor.done: break
+    extractor.close()
+    return extractor.og_image, extractor.markup
+
+def synthetic_page(paragraphs):
+    body = ''.join(f"<p>فقرة رقم {i} <b>نص عريض</b> و <a href='https://example.invalid/{i}'>رابط</a> <i>مائل</i>.</p>"
+                   f"<img src='https://example.invalid/{i}.jpg'/><br/>" for i in range(paragraphs))
+    sidebar = ''.join(f"<li><a href='/p/{i}'>Related post {i}</a></li>" for i in range(300))
+    return (f"<html><head><meta property='og:image' content='https://example.invalid/cover.jpg'/>"
+            f"<script>{'var x = 1;' * 2000}</script></head><body><div class='post'><div class='post-body entry-content'>{body}</div></div>"
+            f"<div class='sidebar'><ul>{sidebar}</ul></div><div class='comments'>{'<p>comment</p>' * 500}</div></body></html>")
+
+def measure(func, pages):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for page in pages: func(page)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / len(pages), peak
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        folder = sys.argv[1]
+        pages = [open(os.path.join(folder, name), encoding='utf-8').read() for name in sorted(os.listdir(folder)) if name.endswith('.html')]
+    else:
+        pages = [synthetic_page(n) for n in (20, 100, 400)]
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1024:.0f} KiB total")
+    for label, func in (("legacy (2x BeautifulSoup)", legacy_extract), ("streaming extractor", streaming_extract)):
+        per_page, peak = measure(func, pages)
+        print(f"{label:<28} {per_page * 1e3:8.2f} ms/page   peak {peak / 1024:8.0f} KiB")
@@ -0,0 +1,33 @@
+# bench_article_index.py
+# Time to build one page of the article list (ARTICLES_PER_PAGE_IN_LIST rows),
+# resolving each row's base post by linear scan versus through ArticleIndex.
+#
+#   python benchmarks/bench_article_index.py
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core
+
+def make_posts(count):
+    return [{'id': f"post-{i}", 'link': f"https://example.invalid/{i}", 'title': f"Title {i}", 'snippet': "..."} for i in range(count)]
+
+def build_page_linear(posts, page):
+    return [next((p for p in posts if p.get('id') == item.get('id')), item) for item in page]
+
+def build_page_indexed(index, page):
+    return [index.get(item.get('id'), item) for item in page]
+
+if __name__ == '__main__':
+    print(f"{'posts':>8} {'index build':>14} {'linear page':>14} {'indexed page':>14}")
+    for count in (500, 5_000, 50_000):
+        posts = make_posts(count)
+        page = posts[-core.ARTICLES_PER_PAGE_IN_LIST:] # Worst case for the scan: rows at the end of the cache
+        index = core.ArticleIndex(posts)
+        runs = max(1, 50_000 // count)
+        build = timeit.timeit(lambda: core.ArticleIndex(posts), number=runs) / runs
+        linear = timeit.timeit(lambda: build_page_linear(posts, page), number=runs) / runs
+        indexed = timeit.timeit(lambda: build_page_indexed(index, page), number=1000) / 1000
+        print(f"{count:>8} {build * 1e3:>12.3f}ms {linear * 1e3:>12.3f}ms {indexed * 1e3:>12.3f}ms")
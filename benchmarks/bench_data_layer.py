@@ -0,0 +1,216 @@
+# bench_data_layer.py
+# Headless benchmarks of the non-UI pipeline in core.py: base cache sync, language-pack builds,
+# article fetch and extraction, post cache load/save, favorites and the offline store. The feed and
+# article pages come from the local stub in stub_services.py and translation from core.StubTranslator,
+# so nothing reaches the real site or Google Translate.
+#
+#   python benchmarks/bench_data_layer.py [--posts 500] [--iterations 20] [--translator-latency 0.05]
+#       Prints p50 / p95 / p99 latency and throughput for every case.
+#
+#   python benchmarks/bench_data_layer.py --output benchmarks/baselines/4.0.json
+#   python benchmarks/bench_data_layer.py --compare benchmarks/baselines/4.0.json [--tolerance 0.25]
+#       Writes the results as a JSON baseline, or compares against one and exits non-zero when a
+#       case's p50 is slower than the baseline's by more than the tolerance.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core
+from stub_services import StubServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FORMAT_VERSION = 1
+
+# --- Measurement ---
+def percentile(sorted_samples, fraction):
+    # Nearest rank, so every reported value is one that was actually measured
+    return sorted_samples[min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples) + 0.5)) - 1))]
+
+def summarize(samples, items_per_op):
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {'iterations': len(samples), 'items_per_op': items_per_op, 'mean_ms': total / len(samples) * 1000,
+            'p50_ms': percentile(ordered, 0.50) * 1000, 'p95_ms': percentile(ordered, 0.95) * 1000,
+            'p99_ms': percentile(ordered, 0.99) * 1000, 'min_ms': ordered[0] * 1000, 'max_ms': ordered[-1] * 1000,
+            'ops_per_sec': len(samples) / total if total else 0.0,
+            'items_per_sec': len(samples) * items_per_op / total if total else 0.0}
+
+def measure(results, name, func, iterations, items_per_op=1, setup=None):
+    # setup(i) runs untimed before each iteration; func(i) is the timed part
+    samples = []
+    for i in range(iterations):
+        if setup: setup(i)
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    results[name] = summarize(samples, items_per_op)
+    print_row(name, results[name])
+
+def print_row(name, result):
+    print(f"{name:<28} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+          f"{result['ops_per_sec']:>10.1f} {result['items_per_sec']:>12.1f}")
+
+# --- Environment ---
+def setup_core(data_dir, stub):
+    # A throwaway app_data_dir and a feed client pointed at the stub. The stub is plain http, so the feed cache is
+    # mounted for http:// too, with max-age 0 so every sync reaches the stub (a 304 when nothing changed).
+    core.initialize_paths(data_dir)
+    core.initialize_background()
+    core.downloaded_languages = [] # Delta sync would otherwise translate through the real endpoint
+    client = core.get_collepedia_client()
+    client._FEED_URL = stub.feed_url
+    if core.http_cache: client._session.mount('http://', core.CachingHTTPAdapter(core.http_cache, 0))
+
+def git_revision():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError: return None
+
+# --- Cases ---
+def bench_sync(results, stub, args):
+    # Cold: empty base cache and a feed whose pages all changed, like a first launch
+    def reset(i):
+        core.base_cache.replace([])
+        stub.publish(1)
+    measure(results, 'sync.cold', lambda i: core.fetch_base_cache_sync(incremental=False), max(3, args.iterations // 4),
+            min(args.posts, core.MAX_ARTICLES_IN_BASE_CACHE), setup=reset)
+    measure(results, 'sync.incremental', lambda i: core.fetch_base_cache_sync(), args.iterations, args.new_posts,
+            setup=lambda i: stub.publish(args.new_posts))
+    measure(results, 'sync.unchanged', lambda i: core.fetch_base_cache_sync(), args.iterations)
+
+def bench_language_pack(results, args):
+    posts = list(core.base_cache)
+    for post in posts: post.setdefault('snippet', f"{post.get('title', '')} - {', '.join(post.get('categories') or [])}")
+    translator = core.StubTranslator(args.translator_latency)
+    core.work_priority.set(core.PRIORITY_USER) # As a download started from the settings screen
+    measure(results, 'pack.build', lambda i: core.LanguagePackBuilder(translator).build(posts, 'en'), max(3, args.iterations // 4), len(posts))
+    # Three languages in one pass, against three times pack.build
+    measure(results, 'pack.build_multi_3', lambda i: core.LanguagePackBuilder(translator).build_multi(posts, ['en', 'de', 'es']),
+            max(3, args.iterations // 4), 3 * len(posts))
+    memory = core.translation_memory
+    if memory is None: return
+    core.LanguagePackBuilder(translator, memory=memory).build(posts, 'fr') # Warm the memory, as a rebuild after a sync would find it
+    measure(results, 'pack.build_remembered', lambda i: core.LanguagePackBuilder(translator, memory=memory).build(posts, 'fr'),
+            args.iterations, len(posts))
+
+def bench_articles(results, stub, args):
+    service = core.background_service
+    # Unique URLs miss the HTTP cache, so each one is a full download and extraction
+    measure(results, 'article.fetch', lambda i: service.run_sync(core.get_full_article_content_async(stub.article_url(1, f"{time.time_ns()}-{i}"))),
+            args.iterations)
+    url = stub.article_url(2)
+    service.run_sync(core.get_full_article_content_async(url))
+    measure(results, 'article.fetch_cached', lambda i: service.run_sync(core.get_full_article_content_async(url)), args.iterations)
+
+    page = stub.article.decode('utf-8')
+    def extract(i):
+        extractor = core.ArticleHTMLExtractor()
+        extractor.feed(page)
+        extractor.close()
+        return extractor.markup
+    measure(results, 'article.extract', extract, args.iterations * 5)
+    markup = extract(0)
+    measure(results, 'article.split_paragraphs', lambda i: core.split_markup_paragraphs(markup), args.iterations * 5)
+    html = service.run_sync(core.get_full_article_content_async(url))['html_content']
+    measure(results, 'article.split_blocks', lambda i: core.split_html_blocks(html), args.iterations * 5)
+
+def bench_post_cache(results, args):
+    posts = list(core.base_cache)
+    path = os.path.join(core.app_data_dir, 'bench_cache.json')
+    measure(results, 'cache.save', lambda i: core.save_post_cache(posts, path), args.iterations, len(posts))
+    # Opening reads one page of rows, as the list screen does; load_all decodes every row
+    measure(results, 'cache.load', lambda i: core.load_post_cache(path)[:core.ARTICLES_PER_PAGE_IN_LIST], args.iterations, len(posts))
+    measure(results, 'cache.load_all', lambda i: list(core.load_post_cache(path)), args.iterations, len(posts))
+
+def bench_favorites(results, args):
+    links = [post['link'] for post in core.base_cache][:args.favorites]
+    core.load_favorites_sync()
+    measure(results, 'favorites.add', lambda i: [core.add_favorite_sync(link, 'ar') for link in links], 1, len(links))
+    measure(results, 'favorites.flush', lambda i: core.persistence.flush(), 1) # The write the adds were batched into
+    measure(results, 'favorites.lookup', lambda i: [core.is_favorite_sync(link, 'ar') for link in links], args.iterations, len(links))
+    measure(results, 'favorites.list', lambda i: core.get_favorite_articles_sync('ar'), args.iterations, len(links))
+    measure(results, 'favorites.load', lambda i: core.load_favorites_sync(), args.iterations, len(links))
+    measure(results, 'favorites.remove', lambda i: [core.remove_favorite_sync(link, 'ar') for link in links], 1, len(links))
+
+def bench_offline_store(results, stub, args):
+    if core.offline_store is None: return
+    html = core.background_service.run_sync(core.get_full_article_content_async(stub.article_url(3)))['html_content']
+    links = [post['link'] for post in core.base_cache][:args.favorites]
+    measure(results, 'offline.put', lambda i: [core.store_offline_article_sync(link, 'ar', html) for link in links], 1, len(links))
+    measure(results, 'offline.get', lambda i: [core.load_offline_article_sync(link, 'ar') for link in links], args.iterations, len(links))
+    measure(results, 'offline.clear', lambda i: core.clear_offline_articles_sync('ar'), 1, len(links))
+
+# --- Baselines ---
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, 'r', encoding='utf-8') as f: baseline = json.load(f)
+    print(f"\nAgainst {baseline_path} ({baseline.get('app_version')}, {baseline.get('revision') or 'unknown revision'}):")
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old or not old.get('p50_ms'):
+            print(f"{name:<28} {'new':>10}")
+            continue
+        ratio = result['p50_ms'] / old['p50_ms']
+        flag = 'REGRESSION' if ratio > 1 + tolerance else ''
+        if flag: regressions.append(name)
+        print(f"{name:<28} {old['p50_ms']:>10.2f} -> {result['p50_ms']:>10.2f}ms {ratio:>7.2f}x {flag}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=core.MAX_ARTICLES_IN_BASE_CACHE, help="Posts in the stub feed")
+    parser.add_argument('--new-posts', type=int, default=5, help="Posts published before each incremental sync")
+    parser.add_argument('--favorites', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--server-latency', type=float, default=0.0, help="Seconds the stub waits before each response")
+    parser.add_argument('--translator-latency', type=float, default=0.05, help="Seconds per StubTranslator request")
+    parser.add_argument('--only', default=None, help="Comma-separated groups: sync,pack,article,cache,favorites,offline")
+    parser.add_argument('--output', default=None, help="Write the results to this JSON file")
+    parser.add_argument('--compare', default=None, help="Baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p50 slowdown before --compare fails")
+    args = parser.parse_args()
+
+    groups = set(args.only.split(',')) if args.only else {'sync', 'pack', 'article', 'cache', 'favorites', 'offline'}
+    data_dir = tempfile.mkdtemp(prefix='collepedia-bench-')
+    results = {}
+    try:
+        with StubServer(args.posts, args.server_latency) as stub:
+            setup_core(data_dir, stub)
+            print(f"{'case':<28} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10} {'items/s':>12}")
+            # Everything after the sync works on the posts it fetched, so the base cache is always filled first
+            if 'sync' in groups: bench_sync(results, stub, args)
+            else: core.fetch_base_cache_sync(incremental=False)
+            if 'pack' in groups: bench_language_pack(results, args)
+            if 'article' in groups: bench_articles(results, stub, args)
+            if 'cache' in groups: bench_post_cache(results, args)
+            if 'favorites' in groups: bench_favorites(results, args)
+            if 'offline' in groups: bench_offline_store(results, stub, args)
+            requests_served = {'feed': stub.feed_requests, 'article': stub.article_requests}
+            memory = core.cache_manager.get_report()
+            queue = core.work_queue.get_stats()
+    finally:
+        if core.background_service: core.background_service.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"Stub requests: {requests_served}")
+    print(f"Cache memory: {memory['total'] / 2**20:.1f} MB " + ", ".join(f"{name} {size / 2**20:.2f}" for name, size in memory['caches'].items()))
+    for name, stats in queue.items():
+        if stats['jobs']: print(f"Queue {name}: {stats['jobs']} jobs, wait p50/p95/max {stats['wait_ms_p50']:.1f}/{stats['wait_ms_p95']:.1f}/{stats['wait_ms_max']:.1f} ms, "
+                               f"run p50/p95 {stats['run_ms_p50']:.1f}/{stats['run_ms_p95']:.1f} ms")
+
+    if args.output:
+        report = {'format': BASELINE_FORMAT_VERSION, 'app_version': core.APP_VERSION, 'revision': git_revision(), 'created': time.time(),
+                  'python': platform.python_version(), 'platform': platform.platform(), 'config': vars(args), 'results': results,
+                  'memory': memory, 'queue': queue}
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions: sys.exit(f"{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
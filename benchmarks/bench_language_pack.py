@@ -0,0 +1,36 @@
+# bench_language_pack.py
+# Compares the old one-string-per-request translation path with the batched
+# LanguagePackBuilder, using StubTranslator so no network is involved.
+#
+#   python benchmarks/bench_language_pack.py --posts 500 --latency 0.2
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core
+
+def make_posts(count):
+    return [{'id': str(i), 'link': f"https://example.invalid/post-{i}",
+             'title': f"عنوان المقال رقم {i}", 'snippet': "نص تجريبي قصير لملخص المقال " * 4}
+            for i in range(count)]
+
+def run(label, posts, translator, **builder_kwargs):
+    builder = core.LanguagePackBuilder(translator, **builder_kwargs)
+    start = time.perf_counter()
+    builder.build(posts, 'en')
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f}s  {translator.request_count:6d} requests")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=core.MAX_ARTICLES_IN_BASE_CACHE)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, default=core.TRANSLATE_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts)
+    run("sequential, 1 per request", posts, core.StubTranslator(args.latency), max_concurrency=1, max_items=1)
+    run(f"batched, {args.concurrency} concurrent", posts, core.StubTranslator(args.latency), max_concurrency=args.concurrency)
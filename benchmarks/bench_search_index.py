@@ -0,0 +1,66 @@
+# bench_search_index.py
+# Offline search over a synthetic corpus of Arabic and English articles: index build time,
+# query latency percentiles (whole words and a still-being-typed prefix) and the cost of
+# folding one sync delta into a built index.
+#
+#   python benchmarks/bench_search_index.py [--docs 10000]
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import core
+
+ARABIC_WORDS = "الجامعة الطلاب التعليم البحث العلمي الامتحانات المدرسة المعلم الكتاب الدراسة المنحة الكلية الطب الهندسة القبول النتائج".split()
+LATIN_WORDS = "university students education research exams school teacher book study scholarship college medicine engineering admission results".split()
+
+def make_posts(count, seed=1):
+    rng = random.Random(seed)
+    vocabulary = ARABIC_WORDS + LATIN_WORDS + [f"term{i}" for i in range(5000)] # A long tail of rare words
+    def sentence(words): return ' '.join(rng.choice(vocabulary) for _ in range(words))
+    return [{'id': f"post-{i}", 'link': f"https://example.invalid/{i}", 'title': sentence(8), 'snippet': sentence(30)} for i in range(count)]
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def time_queries(index, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=10_000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    posts = make_posts(args.docs)
+    start = time.perf_counter()
+    index = core.SearchIndex('ar')
+    index.add_posts(posts)
+    build = time.perf_counter() - start
+    print(f"build: {args.docs} articles, {len(index.postings)} terms in {build * 1e3:.0f}ms")
+
+    rng = random.Random(2)
+    words = ARABIC_WORDS + LATIN_WORDS
+    suites = {'one word': [rng.choice(words) + ' ' for _ in range(args.queries)],
+              'two words': [f"{rng.choice(words)} {rng.choice(words)} " for _ in range(args.queries)],
+              'prefix': [rng.choice(words)[:4] for _ in range(args.queries)]}
+    print(f"{'query':>10} {'p50':>9} {'p95':>9} {'max':>9}")
+    for name, queries in suites.items():
+        samples = time_queries(index, queries)
+        print(f"{name:>10} {percentile(samples, 0.5) * 1e3:>7.2f}ms {percentile(samples, 0.95) * 1e3:>7.2f}ms {max(samples) * 1e3:>7.2f}ms")
+
+    delta = make_posts(core.DELTA_SYNC_PAGE_SIZE, seed=3)
+    for i, post in enumerate(delta): post['id'], post['link'] = f"new-{i}", f"https://example.invalid/new/{i}"
+    start = time.perf_counter()
+    index.remove_ids([p['id'] for p in posts[-len(delta):]])
+    index.add_posts(delta)
+    print(f"delta: {len(delta)} added, {len(delta)} evicted in {(time.perf_counter() - start) * 1e3:.2f}ms")
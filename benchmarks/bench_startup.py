@@ -0,0 +1,66 @@
+# bench_startup.py
+# Startup timing harness.
+#
+#   python benchmarks/bench_startup.py [--budget-ms 1500]
+#       Imports main.py in a fresh interpreter under -X importtime and reports
+#       the slowest imports made by main.py and by core.py (the data layer it
+#       imports first); exits non-zero when the import of main exceeds the budget.
+#
+#   python benchmarks/bench_startup.py --history <app_data_dir>/startup_timings.json
+#       Prints the per-phase timings the app records on every launch
+#       (imports, module_loaded, build, kv_loaded, on_start, first_frame,
+#       services_started, caches_loaded), so field devices can be compared.
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_imports():
+    env = dict(os.environ, KIVY_NO_ARGS='1', KIVY_NO_CONSOLELOG='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0: sys.exit(f"Importing main failed:\n{result.stderr[-2000:]}")
+    # importtime prints children before their parent, indented two spaces per level below it
+    direct, core_children, pending = {}, {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line: continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        level, name, ms = (len(name) - len(name.lstrip()) - 1) // 2, name.strip(), int(cumulative) / 1000
+        if level == 2: pending[name] = ms
+        elif level == 1:
+            if name == 'core': core_children = {f"core > {child}": t for child, t in pending.items()}
+            direct[name] = ms
+            pending = {}
+        elif level == 0:
+            if name == 'main': return {**direct, **core_children}, ms
+            direct, core_children, pending = {}, {}, {}
+    sys.exit("main did not show up in the -X importtime output")
+
+def print_history(path):
+    with open(path, 'r', encoding='utf-8') as f: history = json.load(f)
+    phases = list(history[-1]['phases']) if history else []
+    print(f"{'run':>4} " + ' '.join(f"{p:>16}" for p in phases))
+    for i, run in enumerate(history):
+        print(f"{i:>4} " + ' '.join(f"{run['phases'].get(p, 0) * 1000:>14.0f}ms" for p in phases))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=None)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--history', default=None)
+    args = parser.parse_args()
+
+    if args.history:
+        print_history(args.history)
+        sys.exit(0)
+
+    imports, total = measure_imports()
+    for name, ms in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40} {ms:8.1f}ms")
+    print(f"{'import main (total)':<40} {total:8.1f}ms")
+    if args.budget_ms is not None and total > args.budget_ms:
+        sys.exit(f"Startup import budget exceeded: {total:.0f}ms > {args.budget_ms:.0f}ms")
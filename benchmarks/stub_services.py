@@ -0,0 +1,144 @@
+# stub_services.py
+# Local stand-ins for the services the data layer talks to, so it can be benchmarked offline.
+#
+#   StubServer serves a Blogger RSS feed (honouring start-index / max-results) and article
+#   pages built from fixtures/, with ETags so conditional requests get a 304. The shipped
+#   fixtures are Blogger-shaped stand-ins; --record replaces them with live pages.
+#   core.StubTranslator stands in for Google Translate.
+#
+#   python benchmarks/stub_services.py --record
+#       Refreshes fixtures/ from the live site (feed titles and one article page).
+#
+#   python benchmarks/stub_services.py --serve 8765
+#       Runs the stub on its own, e.g. to point the app at it by hand.
+
+import os
+import sys
+import json
+import zlib
+import time
+import argparse
+import threading
+from email.utils import formatdate
+from urllib.parse import urlsplit, parse_qs
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FEED_ITEMS_FILE = os.path.join(FIXTURES_DIR, 'feed_items.json')
+ARTICLE_FILE = os.path.join(FIXTURES_DIR, 'article.html')
+FEED_PATH = '/feeds/posts/default'
+LIVE_SITE = 'https://colle-pedia.blogspot.com'
+
+def load_fixtures():
+    with open(FEED_ITEMS_FILE, 'r', encoding='utf-8') as f: items = json.load(f)
+    with open(ARTICLE_FILE, 'rb') as f: article = f.read()
+    return items, article
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, like the real site
+
+    def log_message(self, format, *args): pass
+
+    def _send(self, body, content_type, etag):
+        if self.server.latency: time.sleep(self.server.latency)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub, url = self.server.stub, urlsplit(self.path)
+        if url.path == FEED_PATH:
+            query = parse_qs(url.query)
+            start = int(query.get('start-index', ['1'])[0])
+            count = int(query.get('max-results', ['25'])[0])
+            with stub.lock:
+                stub.feed_requests += 1
+                generation = stub.post_count
+            self._send(stub.render_feed(generation, start, count), 'application/rss+xml; charset=UTF-8', f'"feed-{generation}-{start}-{count}"')
+        elif url.path.endswith('.html'):
+            with stub.lock: stub.article_requests += 1
+            self._send(stub.article, 'text/html; charset=UTF-8', f'"article-{stub.article_etag}"')
+        else:
+            self.send_error(404)
+
+class StubServer:
+    # Posts are numbered oldest first; publish() adds newer ones at the top of the feed, like a new blog post
+    def __init__(self, post_count=500, latency=0.0, port=0):
+        self.items, self.article = load_fixtures()
+        self.article_etag = zlib.crc32(self.article)
+        self.post_count = post_count
+        self.lock = threading.Lock()
+        self.feed_requests = self.article_requests = 0
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub, self.httpd.latency = self, latency
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.feed_url = self.url + FEED_PATH
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='stub-server', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def publish(self, count=1):
+        with self.lock: self.post_count += count
+
+    def article_url(self, number, variant=None):
+        return f"{self.url}/2024/01/post-{number}.html" + (f"?v={variant}" if variant is not None else '')
+
+    def render_feed(self, post_count, start, count):
+        entries = []
+        for number in range(post_count - start + 1, max(0, post_count - start + 1 - count), -1):
+            item = self.items[number % len(self.items)]
+            published = formatdate(1_700_000_000 + number * 3600, usegmt=True)
+            categories = ''.join(f"<category>{escape(c)}</category>" for c in item.get('categories', []))
+            entries.append(f"<item><guid isPermaLink='false'>tag:blogger.com,1999:blog-0.post-{number}</guid><pubDate>{published}</pubDate>"
+                           f"{categories}<title>{escape(item['title'])} ({number})</title><link>{self.article_url(number)}</link>"
+                           f"<author>{escape(item.get('author') or '')}</author><description>{escape(item['title'])}</description></item>")
+        return (f"<?xml version='1.0' encoding='UTF-8'?><rss version='2.0'><channel><title>Collepedia</title><link>{self.url}/</link>"
+                f"{''.join(entries)}</channel></rss>").encode('utf-8')
+
+def record_fixtures(max_posts=50):
+    import requests
+    import feedparser
+    response = requests.get(LIVE_SITE + FEED_PATH, params={'alt': 'rss', 'max-results': max_posts}, timeout=15)
+    response.raise_for_status()
+    entries = feedparser.parse(response.content).entries
+    if not entries: sys.exit("The live feed returned no entries; fixtures left as they are")
+    items = [{'title': e.get('title', ''), 'categories': [t.get('term', '') for t in e.get('tags', []) if t.get('term')],
+              'author': e.get('author')} for e in entries]
+    article = requests.get(entries[0].link, timeout=15)
+    article.raise_for_status()
+    with open(FEED_ITEMS_FILE, 'w', encoding='utf-8') as f: json.dump(items, f, ensure_ascii=False, indent=1)
+    with open(ARTICLE_FILE, 'wb') as f: f.write(article.content)
+    print(f"Recorded {len(items)} feed items and {entries[0].link} ({len(article.content)} bytes)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', action='store_true')
+    parser.add_argument('--serve', type=int, default=None, metavar='PORT')
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.record: record_fixtures()
+    elif args.serve is not None:
+        with StubServer(args.posts, args.latency, args.serve) as stub:
+            print(f"Serving {args.posts} posts: feed {stub.feed_url}, articles like {stub.article_url(1)}")
+            try: stub.thread.join()
+            except KeyboardInterrupt: pass
+    else: parser.print_help()
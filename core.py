@@ -0,0 +1,2435 @@
+# core.py
+# Collepedia Mobile App - data layer: caches, sync, translation, offline storage and search.
+# Imports nothing from Kivy so it can run headless (benchmarks, tools); main.py builds the UI on top of it.
+
+import time
+STARTUP_T0 = time.perf_counter() # Reference point for the startup phase timings; main.py imports this module first
+
+import os
+import sys
+import json
+import asyncio
+import threading
+import contextvars
+import atexit
+import tempfile
+import random
+import math
+import bisect
+import heapq
+import unicodedata
+import itertools
+import hashlib
+import sqlite3
+import zlib
+import io
+import re
+import mmap
+import struct
+from array import array
+import html
+from html.parser import HTMLParser
+from collections import OrderedDict, Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial, wraps
+from contextlib import contextmanager, asynccontextmanager, nullcontext
+
+# collepedia, deep_translator, bs4, httpx and PIL are imported where first used to keep them off the startup path
+from urllib.parse import urlparse
+from cachetools import LRUCache
+
+# --- Configuration ---
+APP_NAME = "Collepedia Mobile"
+APP_VERSION = "4.0"
+CACHE_DIR_NAME = "app_data"
+BASE_CACHE_FILE_NAME = "ar_base_cache.json"
+LANG_CACHE_PREFIX = "list_cache_"
+COMPACT_CACHE_EXT = ".cpc"
+OFFLINE_ARTICLE_DIR_NAME = "offline_articles"
+SETTINGS_FILE_NAME = "settings.json"
+LAST_POST_FILE_NAME = "last_post.json"
+FAVORITES_FILE_NAME = "favorites.json"
+STARTUP_TIMINGS_FILE_NAME = "startup_timings.json"
+LANGUAGES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'languages.json')
+TRANSLATION_DB_FILE_NAME = "translations.sqlite3"
+THUMBNAIL_DIR_NAME = "thumbnails"
+TRACE_FILE_NAME = "trace.json"
+PREFETCH_CHECKPOINT_FILE_NAME = "offline_prefetch.json"
+OFFLINE_INDEX_FILE_NAME = "index.sqlite3"
+OFFLINE_BLOB_EXT = ".z"
+HTTP_CACHE_DB_FILE_NAME = "http_cache.sqlite3"
+
+DEFAULT_CONTENT_LANG = 'ar'
+DEFAULT_UI_LANG = 'en'
+
+MAX_ARTICLES_IN_BASE_CACHE = 500
+ARTICLES_PER_PAGE_IN_LIST = 25
+LOAD_MORE_SCROLL_THRESHOLD = 0.1 # Fraction of the list left below the viewport when the next page is appended
+BACKGROUND_TASK_INTERVAL_SECONDS = 3600 # 1 hour; the longest the sync waits while nothing new turns up
+SYNC_MIN_INTERVAL_SECONDS = 10 * 60 # Right after new posts, when more are likely to follow
+SYNC_ERROR_MAX_INTERVAL_SECONDS = 6 * 3600 # Failed syncs back off up to this
+SYNC_STARTUP_DELAY_SECONDS = 5 # Keeps an overdue sync clear of the first screen's loading
+DELTA_SYNC_PAGE_SIZE = 10
+MARKDOWN_CACHE_MAX_BYTES = 4 * 1024 * 1024 # Rendered article paragraphs, sized with sys.getsizeof
+MEMORY_BUDGET_BYTES = 48 * 1024 * 1024 # Everything cache_manager tracks; the coldest caches are shed past it
+ARTICLE_PARAGRAPH_MAX_CHARS = 1500 # Longer paragraphs are split at line breaks to keep each label's texture small
+STARTUP_TIMINGS_HISTORY = 20
+PERSIST_DEBOUNCE_SECONDS = 2.0 # Settings and favorites are written once changes have been quiet this long...
+PERSIST_MAX_DELAY_SECONDS = 10.0 # ...or this long after the first unsaved change, whichever comes first
+TRACE_ENV_VAR = "COLLEPEDIA_TRACE" # Set to 1 (or "tracing": true in settings.json) to record a trace
+TRACE_MAX_BYTES = 5 * 1024 * 1024 # The trace file is rotated past this size
+TRACE_BACKUP_COUNT = 3
+TRACE_FLUSH_INTERVAL_SECONDS = 5
+FRAME_STALL_THRESHOLD_MS = 50 # Frames slower than this are recorded as stalls
+CACHE_DEBUG_JSON = False # Also write the post caches as readable JSON next to the compact files
+TRANSLATION_CACHE_MAX_BYTES = 20 * 1024 * 1024 # 20 MB of translated text
+FALLBACK_IMAGE = 'atlas://kivymd/images/logo/kivymd-icon-256'
+THUMBNAIL_SIZE_DP = 56 # Matches the ImageLeftWidget avatar in ArticleListItem
+THUMBNAIL_CACHE_MAX_BYTES = 30 * 1024 * 1024
+THUMBNAIL_PREFETCH_WORKERS = 3
+HTTP_TIMEOUT_SECONDS = 15
+BACKGROUND_WORKERS = 4 # Worker pool for blocking calls (translation, disk I/O) run by the background service
+HTTP_MAX_CONNECTIONS = 8
+PRIORITY_INTERACTIVE, PRIORITY_USER, PRIORITY_PREFETCH, PRIORITY_BACKGROUND = range(4) # Lower goes first in the work queue
+PRIORITY_NAMES = ('interactive', 'user', 'prefetch', 'background')
+WORK_QUEUE_CAPACITY = HTTP_MAX_CONNECTIONS # Network and translation jobs running at once, across all priorities
+WORK_QUEUE_LIMITS = (WORK_QUEUE_CAPACITY, 4, 4, 2) # Per-priority caps, indexed by priority
+WORK_QUEUE_INTERACTIVE_RESERVE = 2 # Slots only interactive jobs may take
+WORK_QUEUE_AGING_SECONDS = 5.0 # A waiting job moves up one priority for every this many seconds it has waited
+WORK_QUEUE_STATS_WINDOW = 256 # Recent jobs per priority kept for the wait and run percentiles
+HTTP_CACHE_MAX_BYTES = 20 * 1024 * 1024
+ARTICLE_CACHE_MAX_AGE_SECONDS = 3600 # Served without asking the server; older entries are revalidated
+FEED_CACHE_MAX_AGE_SECONDS = 60
+PREFETCH_TOP_ARTICLES = 50 # Articles from the top of the current list made available offline by the bulk job
+PREFETCH_BYTE_BUDGET = 50 * 1024 * 1024
+OFFLINE_STORE_MAX_BYTES = 100 * 1024 * 1024 # Compressed bytes; favorites are never evicted to meet it
+OFFLINE_COMPRESSION_LEVEL = 6
+OFFLINE_CLEAR_AGE_DAYS = 30
+PREFETCH_MAX_CONCURRENCY = 6 # Stays under HTTP_MAX_CONNECTIONS so the UI's own requests are not starved
+PREFETCH_PER_HOST_LIMIT = 3
+
+ACTIVE_TRANSLATION_LANGUAGES = ['en', 'fr', 'es', 'de', 'tr', 'ur', 'id', 'fa']
+TRANSLATE_ENDPOINT = "https://translate.google.com/m"
+TRANSLATE_BATCH_MAX_CHARS = 1800 # Kept well under the endpoint's GET size limit once URL-encoded
+TRANSLATE_BATCH_MAX_ITEMS = 40
+TRANSLATE_MAX_CONCURRENCY = 4
+TRANSLATE_MAX_RETRIES = 3
+TRANSLATE_RETRY_BACKOFF_SECONDS = 1.0
+TRANSLATE_CHUNK_TARGET_CHARS = 400 # Article bodies are cut at the first block boundary past this much text
+TRANSLATE_CHUNK_MAX_CHARS = TRANSLATE_BATCH_MAX_CHARS # Chunks go out over the same GET as pack batches, markup included
+SEARCH_RESULT_LIMIT = 50
+SEARCH_DEBOUNCE_SECONDS = 0.3
+LANGUAGE_FILTER_DEBOUNCE_SECONDS = 0.15
+SEARCH_FIELD_WEIGHTS = {'title': 3, 'snippet': 1, 'body': 1}
+SEARCH_PREFIX_EXPANSIONS = 50 # Vocabulary terms the last, still-being-typed query word may expand to
+
+# Bundled code -> name table of ISO 639-1 languages (generated from pycountry's alpha_2 entries)
+try:
+    with open(LANGUAGES_FILE, 'r', encoding='utf-8') as f: ALL_LANGUAGES = json.load(f)
+except Exception as e:
+    print(f"Could not load bundled languages: {e}")
+    ALL_LANGUAGES = {'en': 'English', 'ja': 'Japanese', 'es': 'Spanish', 'fr': 'French', 'de': 'German', 'ar': 'Arabic'}
+
+# --- Global Variables ---
+collepedia_client = None # Created on first fetch, see get_collepedia_client
+app_data_dir = ""
+BASE_CACHE_FILE = ""
+OFFLINE_ARTICLE_DIR = ""
+SETTINGS_FILE = ""
+FAVORITES_FILE = ""
+LAST_POST_FILE = ""
+
+base_cache = None # ArticleIndex, created below once the class is defined
+language_caches = {} # lang -> ArticleIndex; only the current language is kept loaded, see get_list_display_cache
+language_caches_lock = threading.Lock()
+downloaded_languages = []
+current_language = DEFAULT_CONTENT_LANG
+last_post_id = None
+favorites = {} # (url, lang) -> favorite entry, in the order they were saved
+markdown_cache = LRUCache(maxsize=MARKDOWN_CACHE_MAX_BYTES, getsizeof=lambda paragraphs: sys.getsizeof(paragraphs) + sum(map(sys.getsizeof, paragraphs)))
+markdown_cache_lock = threading.Lock()
+translation_memory = None
+offline_store = None
+http_cache = None
+thumbnail_cache = None
+background_service = None
+sync_state = {} # High-water mark of the last base cache sync
+search_indexes = {} # lang -> SearchIndex, built on the first search in that language
+language_model = None # LanguageModel over ALL_LANGUAGES, built when the settings list is first shown
+startup_timings = [] # (phase, seconds since STARTUP_T0)
+
+# --- Instrumentation ---
+class Tracer:
+    # Chrome trace-event recorder (chrome://tracing, Perfetto UI). While disabled every entry point returns after one
+    # attribute check. While enabled events are buffered in memory, and flush() appends them to a JSON array file
+    # (the closing bracket is optional in that format) that is rotated once it passes TRACE_MAX_BYTES.
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.counters = {}
+        self._events = []
+        self._lock = threading.Lock()
+        self._named_threads = set() # Thread name metadata is written once per thread per file
+        self._async_ids = itertools.count(1)
+        self._pid = os.getpid()
+
+    def configure(self, enabled, path=None):
+        self.enabled = bool(enabled)
+        if path: self.path = path
+
+    @staticmethod
+    def now_us():
+        return (time.perf_counter() - STARTUP_T0) * 1e6
+
+    def _emit(self, event):
+        tid = threading.get_ident()
+        event['pid'], event['tid'] = self._pid, tid
+        with self._lock:
+            if tid not in self._named_threads:
+                self._named_threads.add(tid)
+                self._events.append({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': threading.current_thread().name}})
+            self._events.append(event)
+
+    def complete(self, name, start_us, **args):
+        self._emit({'name': name, 'ph': 'X', 'ts': start_us, 'dur': self.now_us() - start_us, 'args': args})
+
+    @contextmanager
+    def _span(self, name, args):
+        start = self.now_us()
+        try: yield
+        finally: self.complete(name, start, **args)
+
+    def span(self, name, **args):
+        return self._span(name, args) if self.enabled else nullcontext()
+
+    def count(self, name, value=1):
+        if not self.enabled: return
+        with self._lock: total = self.counters[name] = self.counters.get(name, 0) + value
+        self._emit({'name': name, 'ph': 'C', 'ts': self.now_us(), 'args': {'value': total}})
+
+    def instant(self, name, **args):
+        if self.enabled: self._emit({'name': name, 'ph': 'i', 's': 't', 'ts': self.now_us(), 'args': args})
+
+    async def trace_async(self, name, coro):
+        # Coroutines interleave on the loop thread, so they are async begin/end pairs rather than nested spans
+        event_id = next(self._async_ids)
+        self._emit({'name': name, 'cat': 'async', 'ph': 'b', 'id': event_id, 'ts': self.now_us()})
+        try: return await coro
+        finally: self._emit({'name': name, 'cat': 'async', 'ph': 'e', 'id': event_id, 'ts': self.now_us()})
+
+    def flush(self):
+        with self._lock: events, self._events = self._events, []
+        if not events or not self.path: return
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > TRACE_MAX_BYTES: self._rotate()
+            new_file = not os.path.exists(self.path)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('[\n' if new_file else ',\n')
+                f.write(',\n'.join(json.dumps(event, ensure_ascii=False, separators=(',', ':')) for event in events))
+        except Exception as e: print(f"Error writing trace {self.path}: {e}")
+
+    def _rotate(self):
+        for i in range(TRACE_BACKUP_COUNT - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        with self._lock: self._named_threads.clear()
+
+tracer = Tracer()
+
+def traced(name):
+    # Records every call as a span when tracing is on; when it is off the wrapper costs one flag check
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled: return await func(*args, **kwargs)
+                return await tracer.trace_async(name, func(*args, **kwargs))
+            return async_wrapper
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled: return func(*args, **kwargs)
+            start = tracer.now_us()
+            try: return func(*args, **kwargs)
+            finally: tracer.complete(name, start)
+        return wrapper
+    return decorate
+
+# --- Helper Functions ---
+@traced('json.load')
+def load_json_safe(file_path, default_value):
+    if not os.path.exists(file_path): return default_value
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f: return json.load(f)
+    except Exception as e: print(f"Error loading {file_path}: {e}"); return default_value
+
+@traced('json.save')
+def save_json_safe(data, file_path):
+    # Written to a temp file in the same directory and renamed over the target, so a crash mid-write keeps the old file
+    tmp_path = None
+    try:
+        directory = os.path.dirname(file_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + '.', suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except Exception as e:
+        print(f"Error saving {file_path}: {e}")
+        if tmp_path and os.path.exists(tmp_path): os.remove(tmp_path)
+
+def estimate_size(obj, _seen=None):
+    # Deep sys.getsizeof over JSON-like data (dicts, lists, tuples, sets, strings, numbers); shared objects count once
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen: return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict): size += sum(estimate_size(k, seen) + estimate_size(v, seen) for k, v in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset)): size += sum(estimate_size(item, seen) for item in list(obj))
+    return size
+
+class WriteBehindStore:
+    # Holds the latest unsaved state of each JSON file and writes it from a timer thread once changes have been quiet
+    # for debounce seconds (but no later than max_delay after the first one), so a burst of toggles costs one write.
+    # A value may be a callable, evaluated at write time. flush() writes everything pending now (on_pause / on_stop).
+    def __init__(self, debounce=PERSIST_DEBOUNCE_SECONDS, max_delay=PERSIST_MAX_DELAY_SECONDS):
+        self.debounce, self.max_delay = debounce, max_delay
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # One writer at a time, so an older snapshot never lands after a newer one
+        self._timer = None
+        self._first_dirty = self._deadline = None
+        self.writes = self.coalesced = 0
+
+    def _arm_locked(self, delay):
+        self._timer = threading.Timer(max(0.0, delay), self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def mark_dirty(self, path, data):
+        with self._lock:
+            now = time.monotonic()
+            if path in self._pending: self.coalesced += 1
+            self._pending[path] = data
+            if self._first_dirty is None: self._first_dirty = now
+            # Only the deadline moves on each change; the running timer re-arms itself when it fires early
+            self._deadline = min(now + self.debounce, self._first_dirty + self.max_delay)
+            if self._timer is None: self._arm_locked(self._deadline - now)
+
+    def _on_timer(self):
+        with self._lock:
+            remaining = self._deadline - time.monotonic() if self._deadline is not None else 0
+            if remaining > 0:
+                self._arm_locked(remaining)
+                return
+            self._timer = None
+        self.flush()
+
+    def read(self, path, default_value):
+        # Unsaved state wins over the file, so a reload between a change and its write sees the change
+        with self._lock: data = self._pending.get(path)
+        if data is None:
+            with self._flush_lock: return load_json_safe(path, default_value) # Waits out a write in progress
+        return data() if callable(data) else data
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._first_dirty, self._deadline = self._pending, {}, None, None
+                if self._timer: self._timer.cancel(); self._timer = None
+            for path, data in pending.items():
+                save_json_safe(data() if callable(data) else data, path)
+                self.writes += 1
+        return len(pending)
+
+    def get_stats(self):
+        with self._lock: return {'pending': len(self._pending), 'writes': self.writes, 'coalesced': self.coalesced}
+
+persistence = WriteBehindStore()
+atexit.register(persistence.flush) # Headless runs have no on_stop
+
+def mark_startup_phase(name):
+    startup_timings.append((name, time.perf_counter() - STARTUP_T0))
+
+def save_startup_timings():
+    phases = dict(startup_timings)
+    print("Startup: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in startup_timings))
+    path = os.path.join(app_data_dir, STARTUP_TIMINGS_FILE_NAME)
+    history = load_json_safe(path, [])
+    history.append({'at': time.time(), 'version': APP_VERSION, 'phases': phases})
+    save_json_safe(history[-STARTUP_TIMINGS_HISTORY:], path)
+
+def initialize_paths(user_data_dir):
+    global app_data_dir, BASE_CACHE_FILE, OFFLINE_ARTICLE_DIR, SETTINGS_FILE, FAVORITES_FILE, LAST_POST_FILE
+    app_data_dir = os.path.join(user_data_dir, CACHE_DIR_NAME)
+    BASE_CACHE_FILE = os.path.join(app_data_dir, BASE_CACHE_FILE_NAME)
+    OFFLINE_ARTICLE_DIR = os.path.join(app_data_dir, OFFLINE_ARTICLE_DIR_NAME)
+    SETTINGS_FILE = os.path.join(app_data_dir, SETTINGS_FILE_NAME)
+    FAVORITES_FILE = os.path.join(app_data_dir, FAVORITES_FILE_NAME)
+    LAST_POST_FILE = os.path.join(app_data_dir, LAST_POST_FILE_NAME)
+    os.makedirs(OFFLINE_ARTICLE_DIR, exist_ok=True)
+
+def initialize_background(thumbnail_size_px=THUMBNAIL_SIZE_DP, dispatch=None):
+    # Opens the stores and starts the I/O service; the app calls this after the first frame is drawn
+    global sync_state, background_service, translation_memory, thumbnail_cache, offline_store, http_cache
+    sync_state = load_json_safe(LAST_POST_FILE, {})
+    if http_cache is None:
+        try: http_cache = HttpCache(os.path.join(app_data_dir, HTTP_CACHE_DB_FILE_NAME))
+        except Exception as e: print(f"Could not open HTTP cache: {e}")
+    if offline_store is None:
+        try: offline_store = OfflineStore(OFFLINE_ARTICLE_DIR, pinned=is_favorite_sync)
+        except Exception as e: print(f"Could not open offline store: {e}")
+    if translation_memory is None:
+        try: translation_memory = TranslationMemory(os.path.join(app_data_dir, TRANSLATION_DB_FILE_NAME))
+        except Exception as e: print(f"Could not open translation memory: {e}")
+    if thumbnail_cache is None: thumbnail_cache = ThumbnailCache(os.path.join(app_data_dir, THUMBNAIL_DIR_NAME), thumbnail_size_px)
+    if background_service is None: background_service = BackgroundService(dispatch=dispatch)
+
+def get_collepedia_client():
+    global collepedia_client
+    if collepedia_client is None:
+        from collepedia import CollepediaClient
+        collepedia_client = CollepediaClient(user_agent=f"{APP_NAME}/{APP_VERSION}")
+        # The client exposes no hook for its requests.Session, so the feed cache is mounted on it directly
+        if http_cache: collepedia_client._session.mount('https://', CachingHTTPAdapter(http_cache, FEED_CACHE_MAX_AGE_SECONDS))
+    return collepedia_client
+
+# --- Prioritized Work Queue ---
+work_priority = contextvars.ContextVar('work_priority', default=PRIORITY_BACKGROUND) # Priority of the work running in this context
+
+class SharedPriority:
+    # work_priority of work several callers wait on (see RequestCoalescer): it runs at the most urgent of their priorities
+    def __init__(self, priority):
+        self.level = priority_level(priority)
+
+    def join(self, priority):
+        # True when the joining caller made the work more urgent
+        level = priority_level(priority)
+        if level >= self.level: return False
+        self.level = level
+        return True
+
+def priority_level(priority):
+    return priority.level if isinstance(priority, SharedPriority) else priority
+
+class WorkQueue:
+    # Admission control for network and translation jobs. At most capacity run at once, each priority has its own cap,
+    # and only interactive jobs may take the last reserve slots, so an opened article always finds room. When a slot
+    # frees up the waiting job with the best priority goes next, oldest first within a level; every aging_seconds spent
+    # waiting moves a job up one level, so a stream of article opens delays background work but never starves it.
+    # Running jobs are not interrupted: interactive work preempts by jumping the queue, not by cancelling anything.
+    def __init__(self, capacity=WORK_QUEUE_CAPACITY, limits=WORK_QUEUE_LIMITS, reserve=WORK_QUEUE_INTERACTIVE_RESERVE,
+                 aging_seconds=WORK_QUEUE_AGING_SECONDS):
+        self.capacity, self.limits, self.reserve, self.aging_seconds = capacity, limits, reserve, aging_seconds
+        self._lock = threading.Lock()
+        self._waiting = [] # [seq, priority, enqueued_at, grant]
+        self._running = [0] * len(PRIORITY_NAMES)
+        self._seq = itertools.count()
+        self.jobs = [0] * len(PRIORITY_NAMES)
+        self.aged = [0] * len(PRIORITY_NAMES) # Jobs that got their slot ahead of better priorities by waiting
+        self.max_wait = [0.0] * len(PRIORITY_NAMES)
+        self.waits = [deque(maxlen=WORK_QUEUE_STATS_WINDOW) for _ in PRIORITY_NAMES]
+        self.runs = [deque(maxlen=WORK_QUEUE_STATS_WINDOW) for _ in PRIORITY_NAMES]
+
+    def _admit_locked(self, now):
+        # Returns the grant callbacks of the jobs given a slot; they are called once the lock is released. A shared
+        # priority is read afresh each time, and replaced in the entry by the level the job was admitted at.
+        granted = []
+        while self._waiting:
+            running, best = sum(self._running), None
+            for entry in self._waiting:
+                priority = priority_level(entry[1])
+                if running >= self.capacity - (0 if priority == PRIORITY_INTERACTIVE else self.reserve): continue
+                if self._running[priority] >= self.limits[priority]: continue
+                key = (max(PRIORITY_INTERACTIVE, priority - int((now - entry[2]) / self.aging_seconds)), entry[0])
+                if best is None or key < best[0]: best = (key, entry)
+            if best is None: break
+            key, entry = best
+            entry[1] = priority_level(entry[1])
+            self._waiting.remove(entry)
+            self._running[entry[1]] += 1
+            if key[0] < entry[1]: self.aged[entry[1]] += 1
+            granted.append(entry[3])
+        return granted
+
+    def _enqueue(self, priority, grant):
+        now = time.perf_counter()
+        entry = [next(self._seq), priority, now, grant]
+        with self._lock:
+            self._waiting.append(entry)
+            granted = self._admit_locked(now)
+        for grant in granted: grant()
+        return entry
+
+    def _release(self, priority):
+        with self._lock:
+            self._running[priority] -= 1
+            granted = self._admit_locked(time.perf_counter())
+        for grant in granted: grant()
+
+    def reprioritize(self):
+        # For when a waiting job's SharedPriority became more urgent: it may fit a slot its old priority could not
+        with self._lock: granted = self._admit_locked(time.perf_counter())
+        for grant in granted: grant()
+
+    def _withdraw(self, entry):
+        # False when the job was given a slot after all, which the caller then has to release
+        with self._lock:
+            if entry not in self._waiting: return False
+            self._waiting.remove(entry)
+            return True
+
+    def _finish(self, priority, label, enqueued, started):
+        finished = time.perf_counter()
+        wait, run = started - enqueued, finished - started
+        with self._lock:
+            self.jobs[priority] += 1
+            self.waits[priority].append(wait)
+            self.runs[priority].append(run)
+            self.max_wait[priority] = max(self.max_wait[priority], wait)
+        if tracer.enabled: tracer.complete(f"queue.{label}", tracer.now_us() - run * 1e6, priority=PRIORITY_NAMES[priority], wait_ms=round(wait * 1000, 1))
+        self._release(priority)
+
+    @contextmanager
+    def slot(self, priority=None, label='job'):
+        # Blocks the calling thread until the job may run; priority defaults to the caller's work_priority
+        ready = threading.Event()
+        entry = self._enqueue(work_priority.get() if priority is None else priority, ready.set)
+        ready.wait()
+        started = time.perf_counter()
+        try: yield
+        finally: self._finish(entry[1], label, entry[2], started)
+
+    @asynccontextmanager
+    async def slot_async(self, priority=None, label='job'):
+        # slot() for coroutines: the wait is on the loop, so queued jobs do not hold pool threads
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        entry = self._enqueue(work_priority.get() if priority is None else priority, lambda: loop.call_soon_threadsafe(self._wake, ready))
+        try: await ready
+        except asyncio.CancelledError:
+            if not self._withdraw(entry): self._release(entry[1])
+            raise
+        started = time.perf_counter()
+        try: yield
+        finally: self._finish(entry[1], label, entry[2], started)
+
+    @staticmethod
+    def _wake(future):
+        if not future.done(): future.set_result(None)
+
+    @staticmethod
+    def _percentile_ms(samples, fraction):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000 if ordered else 0.0
+
+    def get_stats(self):
+        with self._lock:
+            queued = Counter(priority_level(entry[1]) for entry in self._waiting)
+            return {name: {'jobs': self.jobs[p], 'running': self._running[p], 'queued': queued[p], 'aged': self.aged[p],
+                           'wait_ms_p50': self._percentile_ms(self.waits[p], 0.5), 'wait_ms_p95': self._percentile_ms(self.waits[p], 0.95),
+                           'wait_ms_max': self.max_wait[p] * 1000, 'run_ms_p50': self._percentile_ms(self.runs[p], 0.5),
+                           'run_ms_p95': self._percentile_ms(self.runs[p], 0.95)}
+                    for p, name in enumerate(PRIORITY_NAMES)}
+
+work_queue = WorkQueue()
+
+# --- Background I/O Service ---
+class BackgroundService:
+    # One asyncio loop on a dedicated thread with a shared keep-alive HTTP client; blocking calls go to a bounded pool.
+    # dispatch(fn) hands callbacks to the UI thread; without one they run on the loop thread.
+    def __init__(self, max_workers=BACKGROUND_WORKERS, dispatch=None):
+        import httpx
+        self.dispatch = dispatch or (lambda fn: fn())
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='collepedia-worker')
+        self.loop.set_default_executor(self.executor)
+        self.client = httpx.AsyncClient(timeout=HTTP_TIMEOUT_SECONDS, follow_redirects=True, headers={'User-Agent': f"{APP_NAME}/{APP_VERSION}"},
+                                        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS))
+        self.thread = threading.Thread(target=self._run, name='collepedia-loop', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def run_blocking(self, func, *args):
+        # Runs in a copy of the caller's context, so work_priority follows the call onto the pool thread
+        return await self.loop.run_in_executor(self.executor, partial(contextvars.copy_context().run, func, *args))
+
+    async def run_queued(self, label, func, *args):
+        # run_blocking for network and translation calls: waits for a work queue slot at the caller's priority first
+        async with work_queue.slot_async(label=label): return await self.run_blocking(func, *args)
+
+    @staticmethod
+    async def _prioritized(coro, priority):
+        work_priority.set(priority) # Each task runs in its own context copy, so this stays with this piece of work
+        return await coro
+
+    def submit(self, work, *args, callback=None, error_callback=None, priority=None):
+        # work is a coroutine, or a blocking callable run on the pool with *args. Returns a concurrent Future that
+        # can be cancelled; callbacks go through dispatch and are skipped for cancelled work. priority (default: the
+        # submitting thread's work_priority) is what everything the work queues up waits at.
+        coro = work if asyncio.iscoroutine(work) else self.run_blocking(work, *args)
+        future = asyncio.run_coroutine_threadsafe(self._prioritized(coro, work_priority.get() if priority is None else priority), self.loop)
+        future.add_done_callback(partial(self._deliver, callback, error_callback))
+        return future
+
+    def _deliver(self, callback, error_callback, future):
+        if future.cancelled(): return
+        error = future.exception()
+        if error is not None:
+            if error_callback: self.dispatch(lambda: error_callback(error))
+            else: print(f"Background task error: {error}")
+        elif callback:
+            result = future.result()
+            self.dispatch(lambda: callback(result))
+
+    def run_sync(self, coro, timeout=None):
+        # For worker threads that need a coroutine result; never call this from the loop thread itself
+        if threading.current_thread() is self.thread: raise RuntimeError("run_sync called from the event loop thread")
+        return asyncio.run_coroutine_threadsafe(self._prioritized(coro, work_priority.get()), self.loop).result(timeout)
+
+    def shutdown(self):
+        try: self.run_sync(self.client.aclose(), timeout=2)
+        except Exception as e: print(f"Error closing HTTP client: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False)
+
+# --- HTTP Response Cache ---
+class HttpCache:
+    # SQLite store of response bodies with their ETag / Last-Modified validators, evicted least-recently-used by size.
+    # Entries younger than the caller's max_age are served as is; older ones are revalidated with a conditional request.
+    def __init__(self, db_path, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, size INTEGER, "
+                          "network_bytes INTEGER, fetch_seconds REAL, fetched_at REAL, last_used REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.fresh_hits = self.revalidated = self.misses = self.bytes_saved = self.evictions = 0
+        self.seconds_saved = 0.0
+
+    def lookup(self, url):
+        with self._lock:
+            row = self.conn.execute("SELECT etag, last_modified, body, network_bytes, fetch_seconds, fetched_at FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None: return None
+        etag, last_modified, body, network_bytes, fetch_seconds, fetched_at = row
+        return {'url': url, 'etag': etag, 'last_modified': last_modified, 'body': zlib.decompress(body),
+                'network_bytes': network_bytes, 'fetch_seconds': fetch_seconds, 'fetched_at': fetched_at}
+
+    @staticmethod
+    def is_fresh(entry, max_age):
+        return entry is not None and time.time() - entry['fetched_at'] < max_age
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry and entry['etag']: headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']: headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record_hit(self, entry, revalidation_seconds=None):
+        # revalidation_seconds is the 304 round trip; None means the entry was fresh and no request was made
+        with self._lock:
+            now = time.time()
+            if revalidation_seconds is None: self.fresh_hits += 1
+            else:
+                self.revalidated += 1
+                entry['fetched_at'] = now
+                self.conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (now, entry['url']))
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (now, entry['url']))
+            self.bytes_saved += entry['network_bytes'] or 0
+            tracer.count('http_cache.hits')
+            self.seconds_saved += max(0.0, (entry['fetch_seconds'] or 0.0) - (revalidation_seconds or 0.0))
+
+    def store(self, url, etag, last_modified, body, network_bytes, fetch_seconds):
+        # body is whatever the caller wants back on a hit (raw bytes, or a representation derived from them)
+        compressed = zlib.compress(body)
+        now = time.time()
+        tracer.count('http_cache.misses')
+        with self._lock:
+            self.misses += 1
+            old = self.conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (url, etag, last_modified, compressed, len(compressed), network_bytes, fetch_seconds, now, now))
+            self.total_bytes += len(compressed) - (old[0] if old else 0)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute("SELECT url, size FROM responses ORDER BY last_used LIMIT 32").fetchall()
+            if not rows: self.total_bytes = 0; break
+            self.conn.executemany("DELETE FROM responses WHERE url = ?", [r[:1] for r in rows])
+            self.total_bytes -= sum(r[1] for r in rows)
+            self.evictions += len(rows)
+
+    def get_stats(self):
+        with self._lock: entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {'entries': entries, 'bytes': self.total_bytes, 'max_bytes': self.max_bytes, 'fresh_hits': self.fresh_hits,
+                'revalidated': self.revalidated, 'misses': self.misses, 'bytes_saved': self.bytes_saved,
+                'seconds_saved': self.seconds_saved, 'evictions': self.evictions}
+
+class CachingHTTPAdapter:
+    # requests transport adapter that answers GETs from HttpCache and turns a 304 into the cached 200
+    def __init__(self, cache, max_age):
+        from requests.adapters import HTTPAdapter
+        self.cache, self.max_age = cache, max_age
+        self.transport = HTTPAdapter()
+
+    def _cached_response(self, request, entry):
+        from requests import Response
+        from requests.structures import CaseInsensitiveDict
+        response = Response()
+        response.status_code, response.reason, response._content = 200, 'OK', entry['body']
+        response.headers = CaseInsensitiveDict({'ETag': entry['etag'] or '', 'Last-Modified': entry['last_modified'] or ''})
+        response.url, response.request, response.encoding = request.url, request, 'utf-8'
+        return response
+
+    def send(self, request, **kwargs):
+        if request.method != 'GET': return self.transport.send(request, **kwargs)
+        entry = self.cache.lookup(request.url)
+        if self.cache.is_fresh(entry, self.max_age):
+            self.cache.record_hit(entry)
+            return self._cached_response(request, entry)
+        request.headers.update(self.cache.conditional_headers(entry))
+        start = time.perf_counter()
+        response = self.transport.send(request, **kwargs)
+        elapsed = time.perf_counter() - start
+        if response.status_code == 304 and entry:
+            self.cache.record_hit(entry, elapsed)
+            return self._cached_response(request, entry)
+        if response.status_code == 200:
+            content = response.content
+            tracer.count('net.bytes', len(content))
+            self.cache.store(request.url, response.headers.get('ETag'), response.headers.get('Last-Modified'), content,
+                             len(content), time.perf_counter() - start)
+        return response
+
+    def close(self): self.transport.close()
+
+def load_all_data(load_caches=True):
+    global current_language, downloaded_languages, last_post_id
+    settings = persistence.read(SETTINGS_FILE, {})
+    current_language = settings.get('current_language', DEFAULT_CONTENT_LANG)
+    downloaded_languages = settings.get('downloaded_languages', [])
+    last_post_id = settings.get('last_post_id', None)
+    if not load_caches: return settings
+    # Caches already in memory are kept current by the sync, so only cold ones are read from disk
+    if not base_cache: base_cache.replace(load_post_cache(BASE_CACHE_FILE))
+    get_list_display_cache(current_language) # Other languages are loaded when first shown
+    load_favorites_sync()
+    return settings
+
+def save_settings(settings):
+    global current_language, downloaded_languages, last_post_id
+    current_language = settings.get('current_language', DEFAULT_CONTENT_LANG)
+    downloaded_languages = list(settings.get('downloaded_languages', []))
+    last_post_id = settings.get('last_post_id', None)
+    persistence.mark_dirty(SETTINGS_FILE, dict(settings, downloaded_languages=downloaded_languages))
+
+# --- Compact Post Cache Format ---
+# Little-endian layout, version 1:
+#   header   magic 'CPC1', version u16, field count u16, record count u32, string count u32, string table offset u32
+#   fields   field count x (name string id u32, kind u8, 3 pad bytes); kind 0 = str, 1 = JSON-encoded value
+#   records  record count x field count x string id u32 (NO_STRING when the post has no value)
+#   strings  (string count + 1) x u32 offsets into the UTF-8 blob that follows; every string is stored once
+CACHE_MAGIC = b'CPC1'
+CACHE_FORMAT_VERSION = 1
+CACHE_HEADER = struct.Struct('<4sHHIII')
+CACHE_FIELD = struct.Struct('<IB3x')
+NO_STRING = 0xFFFFFFFF
+
+def compact_cache_path(json_path):
+    return os.path.splitext(json_path)[0] + COMPACT_CACHE_EXT
+
+def write_compact_cache(posts, path):
+    fields, kinds = [], {}
+    for post in posts:
+        for key, value in post.items():
+            if key not in kinds: fields.append(key); kinds[key] = 0
+            if value is not None and not isinstance(value, str): kinds[key] = 1
+    strings, offsets, blob = {}, array('I', [0]), bytearray()
+    def intern(text):
+        sid = strings.get(text)
+        if sid is None:
+            sid = strings[text] = len(strings)
+            blob.extend(text.encode('utf-8'))
+            offsets.append(len(blob))
+        return sid
+    field_table = b''.join(CACHE_FIELD.pack(intern(name), kinds[name]) for name in fields)
+    records = array('I')
+    for post in posts:
+        for name in fields:
+            value = post.get(name)
+            if value is None: records.append(NO_STRING)
+            else: records.append(intern(value if kinds[name] == 0 else json.dumps(value, ensure_ascii=False)))
+    if sys.byteorder != 'little': offsets.byteswap(); records.byteswap()
+    strings_offset = CACHE_HEADER.size + len(field_table) + len(records) * 4
+    header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, len(fields), len(posts), len(strings), strings_offset)
+    # A temp file of its own, so a pack build and a delta sync writing the same cache cannot clobber each other's
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in (header, field_table, records.tobytes(), offsets.tobytes(), blob): f.write(chunk)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, path) # Readers see either the old file or the complete new one
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+class CompactPostList:
+    # Read-only, memory-mapped view of a compact cache file; a post is decoded the first time it is read
+    def __init__(self, path):
+        with open(path, 'rb') as f: self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, field_count, self._count, self._string_count, self._strings_offset = CACHE_HEADER.unpack_from(self._mm, 0)
+        if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION: raise ValueError(f"Unsupported cache file {path}")
+        self._record = struct.Struct(f'<{field_count}I')
+        self._records_offset = CACHE_HEADER.size + field_count * CACHE_FIELD.size
+        self._blob_offset = self._strings_offset + (self._string_count + 1) * 4
+        self._offsets = array('I', self._mm[self._strings_offset:self._blob_offset])
+        if sys.byteorder != 'little': self._offsets.byteswap()
+        self._strings = {}
+        self._posts = [None] * self._count
+        self._fields = []
+        for i in range(field_count):
+            name_id, kind = CACHE_FIELD.unpack_from(self._mm, CACHE_HEADER.size + i * CACHE_FIELD.size)
+            self._fields.append((self._string(name_id), kind))
+
+    def _string(self, sid):
+        text = self._strings.get(sid)
+        if text is None:
+            start, end = self._offsets[sid] + self._blob_offset, self._offsets[sid + 1] + self._blob_offset
+            text = self._strings[sid] = self._mm[start:end].decode('utf-8')
+        return text
+
+    def _decode(self, index):
+        post = {}
+        for (name, kind), sid in zip(self._fields, self._record.unpack_from(self._mm, self._records_offset + index * self._record.size)):
+            if sid != NO_STRING: post[name] = self._string(sid) if kind == 0 else json.loads(self._string(sid))
+        return post
+
+    def column(self, name):
+        # Decodes one field for every record without building the posts
+        position = next((i for i, (field, _) in enumerate(self._fields) if field == name), None)
+        if position is None: return [None] * self._count
+        kind = self._fields[position][1]
+        ids = array('I', self._mm[self._records_offset:self._records_offset + self._count * self._record.size])
+        if sys.byteorder != 'little': ids.byteswap()
+        return [None if sid == NO_STRING else (self._string(sid) if kind == 0 else json.loads(self._string(sid)))
+                for sid in ids[position::len(self._fields)]]
+
+    def __len__(self): return self._count
+
+    def __getitem__(self, key):
+        if isinstance(key, slice): return [self[i] for i in range(*key.indices(self._count))]
+        if key < 0: key += self._count
+        if not 0 <= key < self._count: raise IndexError(key)
+        post = self._posts[key]
+        if post is None: post = self._posts[key] = self._decode(key)
+        return post
+
+    def __iter__(self):
+        for i in range(self._count): yield self[i]
+
+    def memory_bytes(self):
+        # The mapped file is left out: its pages are backed by the file and the OS drops them under pressure
+        return estimate_size([self._posts, self._strings]) + self._offsets.itemsize * len(self._offsets)
+
+    def release(self):
+        # Forgets decoded rows; they are decoded again from the mapping when next read
+        self._posts, self._strings = [None] * self._count, {}
+
+@traced('cache.load_posts')
+def load_post_cache(json_path):
+    # Prefers the compact file; an older JSON cache is migrated the first time it is read
+    path = compact_cache_path(json_path)
+    if os.path.exists(path):
+        try: return CompactPostList(path)
+        except Exception as e: print(f"Error loading {path}, falling back to JSON: {e}")
+    posts = load_json_safe(json_path, [])
+    if posts: save_post_cache(posts, json_path)
+    return posts
+
+@traced('cache.save_posts')
+def save_post_cache(posts, json_path):
+    posts = list(posts)
+    try:
+        write_compact_cache(posts, compact_cache_path(json_path))
+        if not CACHE_DEBUG_JSON and os.path.exists(json_path): os.remove(json_path) # Migrated; JSON is only kept for debugging
+    except Exception as e:
+        print(f"Error saving {compact_cache_path(json_path)}, writing JSON instead: {e}")
+        save_json_safe(posts, json_path)
+        return
+    if CACHE_DEBUG_JSON: save_json_safe(posts, json_path)
+
+# --- Article Index ---
+class ArticleIndex:
+    # Owns a list of posts plus id/link lookup tables; reads (len, iteration, indexing, slicing) behave like the list
+    def __init__(self, posts=None):
+        self.replace(posts or [])
+
+    def replace(self, posts):
+        self.by_id, self.by_link = {}, {}
+        if isinstance(posts, CompactPostList):
+            # Keys map to positions until the first modification, so only rows that are read get decoded
+            self.posts = posts
+            for i, (post_id, link) in reversed(list(enumerate(zip(posts.column('id'), posts.column('link'))))):
+                if post_id is not None: self.by_id[post_id] = i
+                if link: self.by_link[link] = i
+            return
+        self.posts = list(posts)
+        for post in reversed(self.posts): self._add_keys(post) # Earlier entries win on duplicate keys
+
+    def _materialize(self):
+        if isinstance(self.posts, CompactPostList): self.replace(list(self.posts))
+
+    def _resolve(self, value, default):
+        if value is None: return default
+        return self.posts[value] if isinstance(value, int) else value
+
+    def _add_keys(self, post):
+        if post.get('id') is not None: self.by_id[post['id']] = post
+        if post.get('link'): self.by_link[post['link']] = post
+
+    def _remove_keys(self, post):
+        if self.by_id.get(post.get('id')) is post: del self.by_id[post['id']]
+        if self.by_link.get(post.get('link')) is post: del self.by_link[post['link']]
+
+    def merge(self, new_posts, cap=MAX_ARTICLES_IN_BASE_CACHE):
+        # New posts go on top, replacing older copies; returns the ids pushed past the cap
+        self._materialize()
+        new_ids = {p.get('id') for p in new_posts}
+        for post in new_posts:
+            old = self.by_id.get(post.get('id'))
+            if old is not None: self._remove_keys(old)
+        merged = list(new_posts) + [p for p in self.posts if p.get('id') not in new_ids]
+        self.posts, evicted = merged[:cap], merged[cap:]
+        for post in reversed(new_posts): self._add_keys(post)
+        for post in evicted: self._remove_keys(post)
+        return {p.get('id') for p in evicted}
+
+    def remove_ids(self, ids):
+        if not ids or not any(i in self.by_id for i in ids): return 0
+        self._materialize()
+        removed = [p for p in self.posts if p.get('id') in ids]
+        for post in removed: self._remove_keys(post)
+        self.posts = [p for p in self.posts if p.get('id') not in ids]
+        return len(removed)
+
+    def memory_bytes(self):
+        posts = self.posts
+        if isinstance(posts, CompactPostList): return posts.memory_bytes() + estimate_size([self.by_id, self.by_link])
+        return estimate_size([posts, self.by_id, self.by_link])
+
+    def release(self):
+        # Only a file-backed index can give memory back; a modified one holds the only copy of its posts
+        if isinstance(self.posts, CompactPostList): self.posts.release()
+
+    def get(self, post_id, default=None): return self._resolve(self.by_id.get(post_id), default)
+    def get_by_link(self, link, default=None): return self._resolve(self.by_link.get(link), default)
+    def __len__(self): return len(self.posts)
+    def __iter__(self): return iter(self.posts)
+    def __getitem__(self, key): return self.posts[key]
+
+base_cache = ArticleIndex()
+
+def get_list_display_cache(lang):
+    if lang == DEFAULT_CONTENT_LANG: return base_cache
+    cache = language_caches.get(lang)
+    if cache is None and lang in downloaded_languages:
+        # Loaded on demand, and possibly shed again by cache_manager while the language is not shown
+        with language_caches_lock:
+            cache = language_caches.get(lang)
+            if cache is None: cache = language_caches[lang] = ArticleIndex(load_post_cache(get_lang_cache_file(lang)))
+        request_cache_enforce()
+    return cache
+
+def delete_language_pack(lang_code):
+    try:
+        language_caches.pop(lang_code, None)
+        invalidate_search_index(lang_code)
+        if translation_memory: translation_memory.clear_language(lang_code) # Nothing reads them once the pack is gone
+        path = get_lang_cache_file(lang_code)
+        for file_path in (path, compact_cache_path(path)):
+            if os.path.exists(file_path): os.remove(file_path)
+        return True
+    except Exception as e: print(f"Error deleting language pack {lang_code}: {e}"); return False
+
+# --- Favorites & Offline Articles ---
+def load_favorites_sync():
+    global favorites
+    favorites = {(f.get('url'), f.get('lang')): f for f in persistence.read(FAVORITES_FILE, [])}
+
+def save_favorites():
+    # The file keeps the list format; the snapshot is taken when the write-behind store writes it
+    persistence.mark_dirty(FAVORITES_FILE, lambda: list(favorites.values()))
+
+def is_favorite_sync(url, lang):
+    return (url, lang) in favorites
+
+def add_favorite_sync(url, lang):
+    if is_favorite_sync(url, lang): return True
+    display_cache = get_list_display_cache(lang)
+    post = (display_cache.get_by_link(url) if display_cache else None) or base_cache.get_by_link(url, {})
+    entry = {'url': url, 'lang': lang, 'id': post.get('id'), 'title': post.get('title', ''),
+             'snippet': post.get('snippet', ''), 'image_url': post.get('image_url', ''), 'saved_at': time.time()}
+    favorites[(url, lang)] = entry
+    save_favorites()
+    return True
+
+def remove_favorite_sync(url, lang):
+    if favorites.pop((url, lang), None) is None: return False
+    save_favorites()
+    return True
+
+def get_favorite_articles_sync(lang):
+    display_cache = get_list_display_cache(lang)
+    items = []
+    for fav in reversed(favorites.values()):
+        if fav.get('lang') != lang: continue
+        post = (display_cache.get_by_link(fav.get('url')) if display_cache else None) or {}
+        items.append({'id': fav.get('id'), 'link': fav.get('url'), 'lang': lang, 'is_offline': True,
+                      'title': post.get('title') or fav.get('title') or 'No Title',
+                      'snippet': post.get('snippet') or fav.get('snippet') or 'Saved Offline',
+                      'image_url': post.get('image_url') or fav.get('image_url', '')})
+    return items
+
+class OfflineStore:
+    # Content-addressed article bodies: each distinct body is one zlib blob named by its sha1, shared by every
+    # (url, lang) entry with that content. The SQLite index keeps per-url metadata once for all of its languages,
+    # and entries are evicted least-recently-used by compressed size, skipping pinned ones.
+    def __init__(self, directory, max_bytes=OFFLINE_STORE_MAX_BYTES, pinned=None):
+        self.directory, self.max_bytes, self.pinned = directory, max_bytes, pinned
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, OFFLINE_INDEX_FILE_NAME), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS articles (url TEXT PRIMARY KEY, id TEXT, title TEXT, image_url TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (url TEXT, lang TEXT, hash TEXT, size INTEGER, raw_size INTEGER, saved_at REAL, last_used REAL, PRIMARY KEY (url, lang))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash)")
+        self.total_bytes = self._count_bytes_locked()
+        self.hits = self.misses = self.evictions = self.deduplicated = 0
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, digest + OFFLINE_BLOB_EXT)
+
+    def _count_bytes_locked(self):
+        # Shared blobs count once
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY hash)").fetchone()[0]
+
+    def contains(self, url, lang):
+        with self._lock: return self.conn.execute("SELECT 1 FROM entries WHERE url = ? AND lang = ?", (url, lang)).fetchone() is not None
+
+    def get(self, url, lang, touch=True):
+        with self._lock:
+            row = self.conn.execute("SELECT hash FROM entries WHERE url = ? AND lang = ?", (url, lang)).fetchone()
+            if row is None:
+                self.misses += 1
+                tracer.count('offline_store.misses')
+                return None
+            try:
+                with open(self._blob_path(row[0]), 'rb') as f: data = f.read()
+            except FileNotFoundError: # Blob deleted behind our back: forget the entry
+                self._delete_locked([(url, lang)])
+                self.misses += 1
+                return None
+            if touch: self.conn.execute("UPDATE entries SET last_used = ? WHERE url = ? AND lang = ?", (time.time(), url, lang))
+            self.hits += 1
+            tracer.count('offline_store.hits')
+        return zlib.decompress(data).decode('utf-8')
+
+    def get_meta(self, url):
+        with self._lock: row = self.conn.execute("SELECT id, title, image_url FROM articles WHERE url = ?", (url,)).fetchone()
+        return dict(zip(('id', 'title', 'image_url'), row)) if row else {}
+
+    def put(self, url, lang, content, meta=None):
+        # Returns the compressed size of the stored body
+        data = content.encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()
+        path = self._blob_path(digest)
+        compressed = None if os.path.exists(path) else zlib.compress(data, OFFLINE_COMPRESSION_LEVEL)
+        with self._lock:
+            if compressed is not None and not os.path.exists(path):
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f: f.write(compressed)
+                os.replace(tmp_path, path)
+            else: self.deduplicated += 1
+            size = os.path.getsize(path)
+            old = self.conn.execute("SELECT hash FROM entries WHERE url = ? AND lang = ?", (url, lang)).fetchone()
+            now = time.time()
+            self.conn.execute("BEGIN")
+            self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", (url, lang, digest, size, len(data), now, now))
+            current = self.conn.execute("SELECT id, title, image_url FROM articles WHERE url = ?", (url,)).fetchone() or (None, None, None)
+            meta = meta or {}
+            merged = [meta.get(key) or value for key, value in zip(('id', 'title', 'image_url'), current)]
+            self.conn.execute("INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?)", (url, *merged))
+            self.conn.execute("COMMIT")
+            if old and old[0] != digest: self._release_blobs_locked([old[0]])
+            self.total_bytes = self._count_bytes_locked()
+            self._evict_locked()
+        return size
+
+    def _release_blobs_locked(self, digests):
+        for digest in set(digests):
+            if self.conn.execute("SELECT 1 FROM entries WHERE hash = ? LIMIT 1", (digest,)).fetchone(): continue # Still shared
+            try: os.remove(self._blob_path(digest))
+            except FileNotFoundError: pass
+
+    def _delete_locked(self, keys):
+        digests = []
+        self.conn.execute("BEGIN")
+        for url, lang in keys:
+            row = self.conn.execute("SELECT hash FROM entries WHERE url = ? AND lang = ?", (url, lang)).fetchone()
+            if row is None: continue
+            digests.append(row[0])
+            self.conn.execute("DELETE FROM entries WHERE url = ? AND lang = ?", (url, lang))
+        self.conn.execute("DELETE FROM articles WHERE url NOT IN (SELECT url FROM entries)")
+        self.conn.execute("COMMIT")
+        self._release_blobs_locked(digests)
+        self.total_bytes = self._count_bytes_locked()
+
+    def _evict_locked(self):
+        skip = 0
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute("SELECT url, lang FROM entries ORDER BY last_used LIMIT 32 OFFSET ?", (skip,)).fetchall()
+            if not rows: break # Only pinned entries left
+            victims = [key for key in rows if not (self.pinned and self.pinned(*key))]
+            skip += len(rows) - len(victims)
+            if victims:
+                self._delete_locked(victims)
+                self.evictions += len(victims)
+
+    def remove(self, lang=None, older_than=None):
+        # Deletes entries in lang and/or saved before the older_than timestamp (everything when both are None); returns the removed keys
+        where, params = [], []
+        if lang is not None: where.append("lang = ?"); params.append(lang)
+        if older_than is not None: where.append("saved_at < ?"); params.append(older_than)
+        with self._lock:
+            keys = self.conn.execute("SELECT url, lang FROM entries" + (" WHERE " + " AND ".join(where) if where else ""), params).fetchall()
+            self._delete_locked(keys)
+            if lang is None and older_than is None: # Also drop stray blobs and pre-store .html files
+                for name in os.listdir(self.directory):
+                    if name.endswith((OFFLINE_BLOB_EXT, '.html')): os.remove(os.path.join(self.directory, name))
+        return keys
+
+    def get_stats(self):
+        with self._lock:
+            entries, raw_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(raw_size), 0) FROM entries").fetchone()
+            blobs = self.conn.execute("SELECT COUNT(DISTINCT hash) FROM entries").fetchone()[0]
+        return {'entries': entries, 'blobs': blobs, 'bytes': self.total_bytes, 'raw_bytes': raw_bytes, 'max_bytes': self.max_bytes,
+                'compression_ratio': raw_bytes / self.total_bytes if self.total_bytes else 0.0, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'deduplicated': self.deduplicated}
+
+def get_legacy_offline_article_path(url, lang):
+    # One raw HTML file per (url, lang), as written before the offline store; migrated on first read
+    return os.path.join(OFFLINE_ARTICLE_DIR, f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}_{lang}.html")
+
+def load_offline_article_sync(url, lang, touch=True):
+    if not url or offline_store is None: return None
+    try:
+        content = offline_store.get(url, lang, touch)
+        if content is not None: return content
+        legacy_path = get_legacy_offline_article_path(url, lang)
+        if not os.path.exists(legacy_path): return None
+        with open(legacy_path, 'r', encoding='utf-8') as f: content = f.read()
+        offline_store.put(url, lang, content, base_cache.get_by_link(url))
+        os.remove(legacy_path)
+        return content
+    except Exception as e: print(f"Error loading offline article {url}: {e}"); return None
+
+def store_offline_article_sync(url, lang, content, image_url=None):
+    # Metadata is the source-language post's, shared by every translation of the article
+    post = base_cache.get_by_link(url, {})
+    size = offline_store.put(url, lang, content, {'id': post.get('id'), 'title': post.get('title'), 'image_url': image_url or post.get('image_url')})
+    index_offline_article(url, lang, content)
+    return size
+
+async def save_article_offline_async(url, lang, progress_callback, completion_callback):
+    # Runs on the loop: the fetch is awaited rather than blocking a pool worker that its own disk calls would need
+    try:
+        progress_callback(f"Downloading article ({lang.upper()})...")
+        details, content = await get_translated_article_async(url, lang)
+        if not details.get('html_content'):
+            completion_callback(False, "Article content could not be downloaded.")
+            return
+        await background_service.run_blocking(store_offline_article_sync, url, lang, content, details.get('image_url'))
+        completion_callback(True, "Article saved offline.")
+    except asyncio.CancelledError: raise
+    except Exception as e:
+        print(f"Error saving offline article {url}: {e}")
+        completion_callback(False, str(e))
+
+def clear_offline_articles_sync(lang=None, older_than_days=None):
+    try:
+        older_than = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        removed = offline_store.remove(lang, older_than)
+        if lang is None and older_than is None: invalidate_search_index()
+        else:
+            for removed_lang in {key[1] for key in removed}: invalidate_search_index(removed_lang)
+        return True, f"{len(removed)} offline articles cleared."
+    except Exception as e:
+        print(f"Error clearing offline articles: {e}")
+        return False, f"Error clearing offline articles: {e}"
+
+# --- Bulk Offline Prefetch ---
+class OfflinePrefetchJob:
+    # Saves (url, lang) articles offline on the background loop with a bounded pool and per-host limits. The checkpoint
+    # is rewritten after every article so a cancelled or killed job resumes where it stopped; no new article is
+    # started once byte_budget bytes have been written. Items in refresh are fetched again even if already saved.
+    def __init__(self, items, checkpoint_path, refresh=(), byte_budget=PREFETCH_BYTE_BUDGET, max_concurrency=PREFETCH_MAX_CONCURRENCY,
+                 per_host=PREFETCH_PER_HOST_LIMIT, progress_callback=None, done=(), bytes_written=0):
+        self.items = list(dict.fromkeys(tuple(item) for item in items if item[0]))
+        self.refresh = {tuple(item) for item in refresh}
+        self.checkpoint_path, self.byte_budget = checkpoint_path, byte_budget
+        self.max_concurrency, self.per_host = max_concurrency, per_host
+        self.progress_callback = progress_callback
+        self.done = {tuple(item) for item in done}
+        self.bytes_written = bytes_written # Includes earlier runs of a resumed job
+        self.session_bytes = 0
+        self.fetched = self.skipped = self.failed = 0
+        self.cancelled = False
+        self.stop_reason = None
+        self._start = None
+
+    def checkpoint(self):
+        return {'items': [list(item) for item in self.items], 'refresh': [list(item) for item in self.refresh],
+                'done': [list(item) for item in self.done], 'bytes_written': self.bytes_written, 'byte_budget': self.byte_budget}
+
+    def save_checkpoint(self):
+        save_json_safe(self.checkpoint(), self.checkpoint_path)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def get_stats(self):
+        seconds = time.perf_counter() - self._start if self._start else 0.0
+        return {'total': len(self.items), 'done': len(self.done), 'fetched': self.fetched, 'skipped': self.skipped, 'failed': self.failed,
+                'bytes': self.bytes_written, 'seconds': seconds, 'articles_per_second': self.fetched / seconds if seconds else 0.0,
+                'bytes_per_second': self.session_bytes / seconds if seconds else 0.0, 'stop_reason': self.stop_reason}
+
+    async def _save(self, item, total_slots, host_slots):
+        url, lang = item
+        async with host_slots, total_slots:
+            if self.cancelled: return
+            if self.bytes_written >= self.byte_budget:
+                self.stop_reason = 'budget'
+                return
+            if item not in self.refresh and await background_service.run_blocking(offline_store.contains, url, lang):
+                self.skipped += 1
+            else:
+                try:
+                    details, content = await get_translated_article_async(url, lang)
+                    if not details.get('html_content'): raise ValueError("no article content")
+                    size = await background_service.run_blocking(store_offline_article_sync, url, lang, content, details.get('image_url'))
+                    self.bytes_written += size
+                    self.session_bytes += size
+                    self.fetched += 1
+                except asyncio.CancelledError: raise
+                except Exception as e:
+                    print(f"Offline prefetch failed for {url} ({lang}): {e}")
+                    self.failed += 1 # Left out of done, so a resumed job (after a cancel) tries it again
+                    return
+            self.done.add(item)
+            await background_service.run_blocking(self.save_checkpoint)
+        if self.progress_callback: self.progress_callback(self.get_stats())
+
+    async def run(self):
+        self._start = time.perf_counter()
+        total_slots, host_slots = asyncio.Semaphore(self.max_concurrency), {}
+        pending = [item for item in self.items if item not in self.done]
+        tasks = [self._save(item, total_slots, host_slots.setdefault(urlparse(item[0]).netloc, asyncio.Semaphore(self.per_host))) for item in pending]
+        try: await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            if self.cancelled: self.stop_reason = 'cancelled'
+            if self.cancelled: await asyncio.shield(background_service.run_blocking(self.save_checkpoint))
+            elif os.path.exists(self.checkpoint_path): os.remove(self.checkpoint_path) # Ran to the end or out of budget: nothing to resume
+        stats = self.get_stats()
+        print(f"Offline prefetch: {stats}")
+        return stats
+
+def resume_offline_prefetch_job(checkpoint_path, **kwargs):
+    checkpoint = load_json_safe(checkpoint_path, {})
+    if not checkpoint.get('items'): return None
+    return OfflinePrefetchJob(checkpoint['items'], checkpoint_path, refresh=checkpoint.get('refresh', []), done=checkpoint.get('done', []),
+                              bytes_written=checkpoint.get('bytes_written', 0), byte_budget=checkpoint.get('byte_budget', PREFETCH_BYTE_BUDGET), **kwargs)
+
+# --- Thumbnail Cache ---
+def downscale_image(data, size_px):
+    # Centre-crops to the square avatar and re-encodes as JPEG; returns None when Pillow is unavailable
+    try: from PIL import Image, ImageOps
+    except ImportError: return None
+    with Image.open(io.BytesIO(data)) as img:
+        thumb = ImageOps.fit(img.convert('RGB'), (size_px, size_px), Image.LANCZOS)
+        out = io.BytesIO()
+        thumb.save(out, 'JPEG', quality=85, optimize=True)
+        return out.getvalue()
+
+class ThumbnailCache:
+    # Files are named <url hash>_<original size><ext> so bytes saved can be reported across sessions
+    def __init__(self, cache_dir, size_px, max_bytes=THUMBNAIL_CACHE_MAX_BYTES, workers=THUMBNAIL_PREFETCH_WORKERS):
+        import httpx
+        self.cache_dir = cache_dir
+        self.size_px = size_px
+        self.max_bytes = max_bytes
+        self.on_ready = None # Called with the URL from a worker thread once a thumbnail is on disk
+        self.client = httpx.Client(timeout=HTTP_TIMEOUT_SECONDS, follow_redirects=True, headers={'User-Agent': f"{APP_NAME}/{APP_VERSION}"})
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._served = set() # Hits are counted once per image per session, not on every list refresh
+        self._entries = OrderedDict() # url hash -> (path, stored size, original size), oldest first
+        self.total_bytes = 0
+        self.hits = self.misses = self.failures = self.bytes_downloaded = self.bytes_saved = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            try: key, original = os.path.splitext(name)[0].split('_'); files.append((os.path.getmtime(path), key, path, os.path.getsize(path), int(original)))
+            except (ValueError, OSError): continue
+        for _, key, path, size, original in sorted(files):
+            self._entries[key] = (path, size, original)
+            self.total_bytes += size
+
+    @staticmethod
+    def make_key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def get(self, url):
+        # Returns the local path if cached, otherwise queues a download and returns ''
+        if not url: return ''
+        key = self.make_key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                if key not in self._served:
+                    self._served.add(key)
+                    self.hits += 1
+                    self.bytes_saved += entry[2]
+                    tracer.count('thumbnail_cache.hits')
+                return entry[0]
+        self.prefetch([url])
+        return ''
+
+    def prefetch(self, urls):
+        with self._lock:
+            for url in urls:
+                if not url or url in self._pending or self.make_key(url) in self._entries: continue
+                self._pending.add(url)
+                self.misses += 1
+                self.pool.submit(self._download, url)
+
+    def _download(self, url):
+        try:
+            with work_queue.slot(PRIORITY_PREFETCH, 'thumbnail'): response = self.client.get(url)
+            response.raise_for_status()
+            original = response.content
+            tracer.count('net.bytes', len(original))
+            thumb = downscale_image(original, self.size_px)
+            ext = '.jpg' if thumb else (os.path.splitext(urlparse(url).path)[1] or '.jpg')
+            data = thumb or original
+            key = self.make_key(url)
+            path = os.path.join(self.cache_dir, f"{key}_{len(original)}{ext}")
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f: f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._served.add(key)
+                self._entries[key] = (path, len(data), len(original))
+                self.total_bytes += len(data)
+                self.bytes_downloaded += len(original)
+                self.bytes_saved += len(original) - len(data)
+                self._evict_locked()
+            if self.on_ready: self.on_ready(url)
+        except Exception as e:
+            with self._lock: self.failures += 1
+            print(f"Thumbnail error for {url}: {e}")
+        finally:
+            with self._lock: self._pending.discard(url)
+
+    def _evict_locked(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, (path, size, _) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try: os.remove(path)
+            except OSError: pass
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0, 'failures': self.failures,
+                    'bytes_downloaded': self.bytes_downloaded, 'bytes_saved': self.bytes_saved}
+
+# --- Translation Memory ---
+class TranslationMemory:
+    # SQLite store keyed by (sha1 of source text, target language), evicted least-recently-used by total bytes
+    def __init__(self, db_path, max_bytes=TRANSLATION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS translations (hash TEXT, lang TEXT, text TEXT, size INTEGER, last_used REAL, PRIMARY KEY (hash, lang))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+        self.hits = self.misses = self.bytes_read = self.bytes_written = self.evictions = 0
+
+    @staticmethod
+    def make_hash(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, text, lang):
+        return self.get_many([text], lang).get(text)
+
+    def get_many(self, texts, lang):
+        hashes = {self.make_hash(t): t for t in texts if t}
+        found = {}
+        with self._lock:
+            keys = list(hashes)
+            for start in range(0, len(keys), 500): # Stay under SQLite's bound-parameter limit
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(f"SELECT hash, text FROM translations WHERE lang = ? AND hash IN ({','.join('?' * len(chunk))})", [lang, *chunk]).fetchall()
+                for h, translated in rows: found[hashes[h]] = translated
+                if rows: # One statement per chunk: in autocommit mode each statement is its own WAL commit
+                    self.conn.execute(f"UPDATE translations SET last_used = ? WHERE lang = ? AND hash IN ({','.join('?' * len(rows))})",
+                                      [time.time(), lang, *(h for h, _ in rows)])
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+            tracer.count('translation_memory.hits', len(found))
+            tracer.count('translation_memory.misses', len(hashes) - len(found))
+            self.bytes_read += sum(len(t.encode('utf-8')) for t in found.values())
+        return found
+
+    def put(self, text, lang, translated):
+        self.put_many({text: translated}, lang)
+
+    def put_many(self, translations, lang):
+        rows = [(self.make_hash(src), lang, dst, len(dst.encode('utf-8')), time.time()) for src, dst in translations.items() if src and dst]
+        if not rows: return
+        with self._lock:
+            self.conn.execute("BEGIN")
+            for row in rows:
+                old = self.conn.execute("SELECT size FROM translations WHERE hash = ? AND lang = ?", row[:2]).fetchone()
+                self.conn.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)", row)
+                self.total_bytes += row[3] - (old[0] if old else 0)
+                self.bytes_written += row[3]
+            self.conn.execute("COMMIT")
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute("SELECT hash, lang, size FROM translations ORDER BY last_used LIMIT 32").fetchall()
+            if not rows: self.total_bytes = 0; break
+            self.conn.executemany("DELETE FROM translations WHERE hash = ? AND lang = ?", [r[:2] for r in rows])
+            self.total_bytes -= sum(r[2] for r in rows)
+            self.evictions += len(rows)
+
+    def clear_language(self, lang):
+        with self._lock:
+            self.conn.execute("DELETE FROM translations WHERE lang = ?", (lang,))
+            self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+
+    def get_stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {'entries': entries, 'bytes': self.total_bytes, 'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0, 'bytes_read': self.bytes_read,
+                'bytes_written': self.bytes_written, 'evictions': self.evictions}
+
+@traced('translate')
+def translate_sync(text, target_lang, fallback="(Translation Failed)"):
+    if not text or target_lang == DEFAULT_CONTENT_LANG: return text or ""
+    if translation_memory:
+        cached = translation_memory.get(text, target_lang)
+        if cached is not None: return cached
+    try:
+        from deep_translator import GoogleTranslator
+        translated = GoogleTranslator(source='auto', target=target_lang).translate(text)
+        if translated and translation_memory: translation_memory.put(text, target_lang, translated)
+        return translated or ""
+    except Exception as e:
+        print(f"Translate error ({target_lang}): {e}")
+        return fallback
+
+def get_lang_cache_file(lang_code):
+    return os.path.join(app_data_dir, f"{LANG_CACHE_PREFIX}{lang_code}.json")
+
+# --- Batched Translation Pipeline ---
+def normalize_text(text):
+    # Batches are newline-delimited, so each string must fit on one line
+    return ' '.join((text or '').split())
+
+def chunk_text_indices(texts, max_chars=TRANSLATE_BATCH_MAX_CHARS, max_items=TRANSLATE_BATCH_MAX_ITEMS):
+    batches, current, size = [], [], 0
+    for i, text in enumerate(texts):
+        if not text: continue
+        if current and (size + len(text) > max_chars or len(current) >= max_items):
+            batches.append(current); current, size = [], 0
+        current.append(i); size += len(text) + 1
+    if current: batches.append(current)
+    return batches
+
+class WebTranslator:
+    # Same mobile endpoint deep_translator scrapes, but over one pooled keep-alive client
+    def __init__(self, max_connections=TRANSLATE_MAX_CONCURRENCY, timeout=HTTP_TIMEOUT_SECONDS):
+        import httpx
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self.client = httpx.Client(timeout=timeout, headers={'User-Agent': f"{APP_NAME}/{APP_VERSION}"},
+                                   limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+
+    def translate_batch(self, texts, target_lang):
+        with self._lock: self.request_count += 1
+        response = self.client.get(TRANSLATE_ENDPOINT, params={'sl': 'auto', 'tl': target_lang, 'q': '\n'.join(texts)})
+        response.raise_for_status()
+        from bs4 import BeautifulSoup
+        result = BeautifulSoup(response.text, 'lxml').find('div', class_='result-container')
+        if not result: raise ValueError("No translation found in response")
+        return result.get_text().split('\n')
+
+    def close(self): self.client.close()
+
+class StubTranslator:
+    # Offline stand-in so pack builds can be benchmarked without network
+    def __init__(self, latency=0.2, per_char_latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.per_char_latency = per_char_latency
+        self.failure_rate = failure_rate
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def translate_batch(self, texts, target_lang):
+        with self._lock: self.request_count += 1
+        time.sleep(self.latency + self.per_char_latency * sum(len(t) for t in texts))
+        if self.failure_rate and random.random() < self.failure_rate: raise ConnectionError("Simulated translator failure")
+        return [f"[{target_lang}] {t}" for t in texts]
+
+    def close(self): pass
+
+_shared_translator = None
+_shared_translator_lock = threading.Lock()
+
+def get_shared_translator():
+    # Serves article chunks as well as pack batches, so its pool is as wide as the work queue lets them run
+    global _shared_translator
+    with _shared_translator_lock:
+        if _shared_translator is None: _shared_translator = WebTranslator(max_connections=WORK_QUEUE_CAPACITY)
+        return _shared_translator
+
+def translate_chunk_sync(translator, chunk, lang):
+    # One article chunk the translation memory has already missed; falls back to the source chunk on failure
+    try:
+        translated = '\n'.join(translator.translate_batch([chunk], lang)).strip()
+        if translated and translation_memory: translation_memory.put(chunk, lang, translated)
+        return translated or chunk
+    except Exception as e:
+        print(f"Translate error ({lang}): {e}")
+        return chunk
+
+class LanguagePackBuilder:
+    def __init__(self, translator=None, memory=None, max_concurrency=TRANSLATE_MAX_CONCURRENCY, max_retries=TRANSLATE_MAX_RETRIES,
+                 backoff=TRANSLATE_RETRY_BACKOFF_SECONDS, max_chars=TRANSLATE_BATCH_MAX_CHARS, max_items=TRANSLATE_BATCH_MAX_ITEMS):
+        self.translator = translator or get_shared_translator()
+        self.memory = memory
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.stats = {}
+        self.errors = {} # lang -> exception, for languages whose build failed
+        self.priority = work_priority.get() # Taken here: the pool threads running the batches start with a fresh context
+
+    def _translate_split(self, texts, target_lang):
+        translated = self.translator.translate_batch(texts, target_lang)
+        if len(translated) == len(texts): return translated
+        # The translator merged or split lines; bisect until the batch lines up again
+        if len(texts) == 1: return [' '.join(translated)]
+        mid = len(texts) // 2
+        return self._translate_split(texts[:mid], target_lang) + self._translate_split(texts[mid:], target_lang)
+
+    def _translate_with_retry(self, texts, target_lang):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with work_queue.slot(self.priority, 'translate.batch'): return self._translate_split(texts, target_lang)
+            except Exception as e:
+                if attempt >= self.max_retries: raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"Translate batch error ({target_lang}), retry {attempt + 1} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+    @staticmethod
+    def describe_progress(progress, failed):
+        parts = [f"{lang.upper()} " + ('failed' if lang in failed else 'done' if done >= total else f"{done}/{total}")
+                 for lang, (done, total) in progress.items()]
+        return "Translating " + ", ".join(parts)
+
+    def translate_texts_multi(self, texts, target_langs, progress_callback=None, language_callback=None):
+        # The source strings are normalized and deduplicated once, then the batches of every language share one pool of
+        # max_concurrency workers. Batches are queued language by language, so language_callback(lang, results) fires
+        # for the first language while later ones are still translating. A language with a batch that still fails after
+        # the retries is left out of the returned {lang: results} and recorded in self.errors; the others carry on.
+        texts = [normalize_text(t) for t in texts]
+        unique = list(dict.fromkeys(t for t in texts if t))
+        start, requests_before = time.perf_counter(), self.translator.request_count
+        translations, batches, progress, results, failed = {}, {}, {}, {}, {}
+        self.stats = {'strings': sum(1 for t in texts if t), 'unique': len(unique), 'languages': {}}
+        for lang in dict.fromkeys(target_langs):
+            remembered = self.memory.get_many(unique, lang) if self.memory else {}
+            translations[lang] = dict(remembered)
+            pending = [t if t not in remembered else '' for t in unique]
+            batches[lang] = [[unique[i] for i in batch] for batch in chunk_text_indices(pending, self.max_chars, self.max_items)]
+            progress[lang] = [0, len(batches[lang])]
+            self.stats['languages'][lang] = {'remembered': len(remembered), 'batches': len(batches[lang])}
+
+        def finish(lang):
+            results[lang] = [translations[lang].get(t, t) for t in texts]
+            self.stats['languages'][lang]['seconds'] = time.perf_counter() - start
+            if language_callback: language_callback(lang, results[lang])
+
+        for lang in [lang for lang, pending in batches.items() if not pending]: finish(lang) # Everything was remembered
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(self._translate_with_retry, batch, lang): (lang, batch) for lang in batches for batch in batches[lang]}
+            for future in as_completed(futures):
+                lang, batch = futures[future]
+                if lang in failed: continue
+                try: translated = future.result()
+                except Exception as e:
+                    failed[lang] = e
+                    for other, (other_lang, _) in futures.items():
+                        if other_lang == lang: other.cancel()
+                    if progress_callback: progress_callback(self.describe_progress(progress, failed))
+                    continue
+                batch_results = {text: result for text, result in zip(batch, translated) if result}
+                translations[lang].update(batch_results)
+                if self.memory: self.memory.put_many(batch_results, lang)
+                progress[lang][0] += 1
+                if progress_callback: progress_callback(self.describe_progress(progress, failed))
+                if progress[lang][0] == progress[lang][1]: finish(lang)
+        self.errors = failed
+        self.stats.update(requests=self.translator.request_count - requests_before, seconds=time.perf_counter() - start)
+        return results
+
+    def translate_texts(self, texts, target_lang, progress_callback=None):
+        results = self.translate_texts_multi(texts, [target_lang], progress_callback)
+        if target_lang in self.errors: raise self.errors[target_lang]
+        return results[target_lang]
+
+    @staticmethod
+    def pack_texts(posts):
+        texts = []
+        for post in posts: texts.extend((post.get('title'), post.get('snippet')))
+        return texts
+
+    @staticmethod
+    def make_pack(posts, translated):
+        pack = []
+        for i, post in enumerate(posts):
+            item = dict(post)
+            item['title'], item['snippet'] = translated[2 * i], translated[2 * i + 1]
+            pack.append(item)
+        return pack
+
+    def build(self, posts, target_lang, progress_callback=None):
+        return self.make_pack(posts, self.translate_texts(self.pack_texts(posts), target_lang, progress_callback))
+
+    def build_multi(self, posts, target_langs, progress_callback=None, pack_callback=None):
+        # One pass over posts for any number of languages; pack_callback(lang, pack) fires as each pack completes
+        packs = {}
+        def on_language(lang, translated):
+            packs[lang] = self.make_pack(posts, translated)
+            if pack_callback: pack_callback(lang, packs[lang])
+        self.translate_texts_multi(self.pack_texts(posts), target_langs, progress_callback, on_language)
+        return packs
+
+def download_languages_thread(lang_codes, progress_callback, completion_callback, translator=None, pack_callback=None):
+    # Builds one or more packs in a single pass over the base cache. Each pack is saved, and pack_callback(lang) called,
+    # as soon as it is complete; completion_callback(downloaded, errors) gets the languages built and {lang: message}.
+    lang_codes = list(dict.fromkeys(lang_codes))
+    posts = base_cache[:MAX_ARTICLES_IN_BASE_CACHE]
+    if not posts:
+        completion_callback([], {lang: "No base articles loaded yet. Refresh and try again." for lang in lang_codes})
+        return
+    downloaded, errors = [], {}
+    def save_pack(lang, pack):
+        save_post_cache(pack, get_lang_cache_file(lang))
+        language_caches[lang] = ArticleIndex(pack)
+        invalidate_search_index(lang)
+        downloaded.append(lang)
+        if pack_callback: pack_callback(lang)
+    try:
+        progress_callback(f"Translating {len(posts)} articles to {', '.join(lang.upper() for lang in lang_codes)}...")
+        builder = LanguagePackBuilder(translator, memory=translation_memory)
+        builder.build_multi(posts, lang_codes, progress_callback, save_pack)
+        print(f"Language packs {', '.join(lang_codes)}: {builder.stats}")
+        request_cache_enforce()
+        errors.update({lang: f"Could not build language pack {lang.upper()}: {e}" for lang, e in builder.errors.items()})
+    except Exception as e:
+        print(f"Language pack error ({', '.join(lang_codes)}): {e}")
+        errors.update({lang: f"Could not build language pack {lang.upper()}: {e}" for lang in lang_codes if lang not in downloaded})
+    completion_callback(downloaded, errors)
+
+# --- Base Cache Sync ---
+def fetch_posts_sync(max_posts):
+    client = get_collepedia_client()
+    with work_queue.slot(label='feed.fetch'): client.fetch_posts(max_posts=max_posts, per_request=min(max_posts, 25))
+    return client.get_all_posts()
+
+def fetch_new_posts_sync(known_ids):
+    # Widen the window until it reaches a post we already have, so the cost follows the number of new posts
+    page = DELTA_SYNC_PAGE_SIZE
+    while True:
+        posts = fetch_posts_sync(page)
+        for i, post in enumerate(posts):
+            if post.get('id') in known_ids: return posts[:i]
+        if len(posts) < page or page >= MAX_ARTICLES_IN_BASE_CACHE: return posts[:MAX_ARTICLES_IN_BASE_CACHE]
+        page = min(page * 4, MAX_ARTICLES_IN_BASE_CACHE)
+
+def apply_delta_to_language_caches(new_posts, evicted_ids, translator=None):
+    for lang in list(downloaded_languages):
+        cache = language_caches.get(lang)
+        if cache is None: cache = ArticleIndex(load_post_cache(get_lang_cache_file(lang)))
+        try: translated = LanguagePackBuilder(translator, memory=translation_memory).build(new_posts, lang) if new_posts else []
+        except Exception as e:
+            print(f"Delta translation error ({lang}), pack left as is: {e}")
+            continue
+        removed = cache.remove_ids(evicted_ids)
+        if translated: cache.merge(translated)
+        elif not removed: continue # Nothing changed for this language
+        if lang in language_caches: language_caches[lang] = cache # Packs that were not loaded are only updated on disk
+        save_post_cache(cache.posts, get_lang_cache_file(lang))
+        update_search_index(lang, translated, evicted_ids)
+
+def record_sync_state(new_count):
+    global sync_state
+    newest = base_cache[0] if base_cache else {}
+    sync_state = {'last_post_id': newest.get('id'), 'last_post_published': newest.get('published'),
+                  'synced_at': time.time(), 'new_posts': new_count}
+    save_json_safe(sync_state, LAST_POST_FILE)
+
+def fetch_base_cache_sync(incremental=True):
+    # Returns the posts that were not cached before (everything on a cold start), or None on failure
+    known_ids = set(base_cache.by_id)
+    incremental = incremental and bool(known_ids)
+    try:
+        if incremental: new_posts = fetch_new_posts_sync(known_ids)
+        else:
+            fetched = fetch_posts_sync(MAX_ARTICLES_IN_BASE_CACHE)
+            if not fetched: return None
+            new_posts = [p for p in fetched if p.get('id') not in known_ids]
+    except Exception as e:
+        print(f"Base cache sync error: {e}")
+        return None
+    if new_posts or not incremental:
+        if incremental: evicted_ids = base_cache.merge(new_posts)
+        else:
+            base_cache.replace(fetched[:MAX_ARTICLES_IN_BASE_CACHE])
+            evicted_ids = known_ids - set(base_cache.by_id)
+        save_post_cache(base_cache.posts, BASE_CACHE_FILE)
+        update_search_index(DEFAULT_CONTENT_LANG, new_posts, evicted_ids)
+        apply_delta_to_language_caches(new_posts, evicted_ids)
+        request_cache_enforce()
+    record_sync_state(len(new_posts))
+    print(f"Base cache sync: {len(new_posts)} new, {len(base_cache)} cached")
+    return new_posts
+
+class SyncScheduler:
+    # Runs job on a timer thread, never two at once. job returns the new posts ([] when nothing changed) or None on
+    # failure. The interval drops to min_interval after new posts and doubles back up to max_interval while nothing
+    # is new, so a post is never found later than with a fixed max_interval; failures back off up to error_max_interval.
+    # Nothing runs while the app is in the background; a run that fell due meanwhile starts as soon as it returns.
+    def __init__(self, job, min_interval=SYNC_MIN_INTERVAL_SECONDS, max_interval=BACKGROUND_TASK_INTERVAL_SECONDS,
+                 error_max_interval=SYNC_ERROR_MAX_INTERVAL_SECONDS):
+        self.job = job
+        self.min_interval, self.max_interval, self.error_max_interval = min_interval, max_interval, error_max_interval
+        self.interval = max_interval
+        self.foreground, self.running = True, False
+        self.next_run_at = self.last_run_at = self.last_duration = self.last_result = None
+        self.runs = self.failures = self.skipped = 0
+        self.manual = False # The armed run was asked for by the user, see run_now
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def _arm_locked(self, delay):
+        if self._timer: self._timer.cancel()
+        self._timer = None
+        self.next_run_at = time.time() + max(0.0, delay)
+        if not self.foreground: return # set_foreground(True) arms it again
+        self._timer = threading.Timer(max(0.0, delay), self._run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def start(self, last_run_at=None, startup_delay=SYNC_STARTUP_DELAY_SECONDS):
+        # last_run_at carries over from the previous session, so a sync that fell due while the app was closed runs now
+        with self._lock:
+            due_in = last_run_at + self.interval - time.time() if last_run_at else 0
+            self._arm_locked(max(startup_delay, due_in))
+
+    def run_now(self):
+        # Manual refresh: the next run starts now, at user priority, and the schedule carries on from it
+        with self._lock:
+            if self.running:
+                self.skipped += 1
+                return False
+            self.manual = True
+            self._arm_locked(0)
+        return True
+
+    def set_foreground(self, foreground):
+        with self._lock:
+            self.foreground = foreground
+            if not foreground:
+                if self._timer: self._timer.cancel()
+                self._timer = None
+            elif not self.running and self.next_run_at is not None: self._arm_locked(self.next_run_at - time.time())
+
+    def stop(self):
+        with self._lock:
+            if self._timer: self._timer.cancel()
+            self._timer = self.next_run_at = None
+
+    def _run(self):
+        with self._lock:
+            if self.running or not self.foreground or self.next_run_at is None:
+                self.skipped += 1
+                return
+            self.running, self._timer = True, None
+            if self.manual: work_priority.set(PRIORITY_USER) # Each run has a timer thread of its own
+            self.manual = False
+        start = time.time()
+        try: result = self.job()
+        except Exception as e:
+            print(f"Background sync error: {e}")
+            result = None
+        with self._lock:
+            self.running = False
+            self.runs += 1
+            self.last_run_at, self.last_duration = start, time.time() - start
+            if result is None:
+                self.failures += 1
+                self.last_result = 'error'
+                delay = min(self.error_max_interval, self.min_interval * 2 ** (self.failures - 1)) * (1 + random.random() * 0.25)
+            else:
+                self.failures = 0
+                self.last_result = f"{len(result)} new"
+                self.interval = self.min_interval if result else min(self.max_interval, self.interval * 2)
+                delay = self.interval
+            if self.next_run_at is not None: self._arm_locked(delay) # Unless stopped while the job ran
+        print(f"Background sync: {self.get_stats()}")
+
+    def get_stats(self):
+        with self._lock:
+            now = time.time()
+            return {'running': self.running, 'foreground': self.foreground, 'runs': self.runs, 'failures': self.failures,
+                    'skipped': self.skipped, 'interval': self.interval, 'last_result': self.last_result,
+                    'last_run_ago': round(now - self.last_run_at, 1) if self.last_run_at else None,
+                    'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None,
+                    'next_run_in': round(self.next_run_at - now, 1) if self.next_run_at is not None else None}
+
+class RequestCoalescer:
+    # Concurrent awaits of the same key share one task, which is cancelled once nobody is waiting on it. The task
+    # queues work at the most urgent priority among its waiters, so an article the user opens while the prefetch job
+    # is fetching it is not held back at prefetch priority. Only used from the loop thread, so no locking is needed.
+    def __init__(self):
+        self._inflight = {} # key -> [task, waiter count, SharedPriority]
+        self.started = self.joined = 0
+
+    @staticmethod
+    async def _shared(coro_factory, priority):
+        work_priority.set(priority) # Inside the task, so the caller's own context is left alone
+        return await coro_factory()
+
+    async def run(self, key, coro_factory):
+        entry = self._inflight.get(key)
+        if entry is None:
+            priority = SharedPriority(work_priority.get())
+            entry = self._inflight[key] = [asyncio.ensure_future(self._shared(coro_factory, priority)), 0, priority]
+            entry[0].add_done_callback(lambda task: self._inflight.pop(key, None) if self._inflight.get(key) is entry else None)
+            self.started += 1
+        else:
+            self.joined += 1
+            if entry[2].join(work_priority.get()): work_queue.reprioritize()
+        entry[1] += 1
+        try: return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done(): entry[0].cancel()
+
+article_requests = RequestCoalescer()
+
+# --- Article Extraction ---
+def escape_markup(text):
+    # Same escaping as kivy.utils.escape_markup, kept here so the data layer does not import Kivy
+    return text.replace('&', '&amp;').replace('[', '&bl;').replace(']', '&br;')
+
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+BLOCK_ELEMENTS = {'p', 'div', 'section', 'article', 'blockquote', 'pre', 'ul', 'ol', 'table', 'tr', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+MARKUP_TAGS = {'b': ('[b]', '[/b]'), 'strong': ('[b]', '[/b]'), 'i': ('[i]', '[/i]'), 'em': ('[i]', '[/i]'), 'u': ('[u]', '[/u]'),
+               'h1': ('[b]', '[/b]'), 'h2': ('[b]', '[/b]'), 'h3': ('[b]', '[/b]'), 'h4': ('[b]', '[/b]'), 'h5': ('[b]', '[/b]'), 'h6': ('[b]', '[/b]')}
+
+class ArticleHTMLExtractor(HTMLParser):
+    # One pass over the page: picks og:image, copies the .post-body HTML and renders Kivy markup as it goes.
+    # With fragment=True the whole input is treated as the body (used for translated or offline HTML).
+    def __init__(self, body_class='post-body', fragment=False):
+        super().__init__(convert_charrefs=True)
+        self.body_class = body_class
+        self.fragment = fragment
+        self.in_body = fragment
+        self.done = False
+        self.skip_depth = 0 # Inside <script>/<style>
+        self.og_image = None
+        self.first_image = None
+        self._html = []
+        self._markup = []
+        self._stack = [] # (tag, closing markup) for open elements inside the body
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if not self.in_body:
+            if self.done: return
+            if tag == 'meta' and attrs.get('property') == 'og:image' and not self.og_image: self.og_image = attrs.get('content')
+            elif self.body_class in (attrs.get('class') or '').split():
+                self.in_body = True
+                self._html.append(self.get_starttag_text())
+                self._stack.append((tag, ''))
+            return
+        self._html.append(self.get_starttag_text())
+        if tag in ('script', 'style'): self.skip_depth += 1
+        opener, closer = '', ''
+        if self.skip_depth: pass
+        elif tag == 'img':
+            if not self.first_image: self.first_image = attrs.get('src')
+        elif tag == 'br': opener = '\n'
+        elif tag == 'li': opener = '\n• '
+        elif tag == 'a':
+            # Kivy ends the tag at the first ']' and hands the ref over verbatim, so brackets are percent-encoded
+            href = (attrs.get('href') or '#').replace('[', '%5B').replace(']', '%5D')
+            opener, closer = f"[ref={href}][color=0000ff]", '[/color][/ref]'
+        elif tag in MARKUP_TAGS: opener, closer = MARKUP_TAGS[tag]
+        if tag in BLOCK_ELEMENTS and not self.skip_depth: opener, closer = '\n' + opener, closer + '\n'
+        self._markup.append(opener)
+        if tag not in VOID_ELEMENTS: self._stack.append((tag, closer))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS: self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # Like a browser, an end tag implicitly closes any unclosed elements opened after it; stray end tags are dropped
+        if not self.in_body or not any(t == tag for t, _ in self._stack): return
+        while self._stack:
+            open_tag, closer = self._stack.pop()
+            self._html.append(f"</{open_tag}>")
+            if open_tag in ('script', 'style'): self.skip_depth -= 1
+            elif not self.skip_depth: self._markup.append(closer)
+            if open_tag == tag: break
+        if not self._stack and not self.fragment:
+            self.in_body, self.done = False, True
+
+    def handle_data(self, data):
+        if not self.in_body: return
+        # <script>/<style> content reaches us raw (CDATA), so it is copied as is; escaping it would change the code
+        self._html.append(data if self.skip_depth else html.escape(data, quote=False))
+        if not self.skip_depth: self._markup.append(escape_markup(re.sub(r'\s+', ' ', data)))
+
+    @property
+    def html(self): return ''.join(self._html)
+
+    @property
+    def markup(self):
+        text = ''.join(self._markup) + ''.join(closer for _, closer in reversed(self._stack))
+        text = re.sub(r'[ \t]*\n[ \t]*', '\n', text)
+        return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+class HTMLBlockSplitter(HTMLParser):
+    # Cuts body HTML into chunks at block boundaries once a chunk holds target_chars of text. Elements still open at
+    # a cut are closed there and reopened in the next chunk, so every chunk is balanced HTML that translates and
+    # renders on its own. No chunk grows past max_chars, markup included: a block that would is cut between its
+    # inline runs, and a text run that does not fit is cut at whitespace.
+    def __init__(self, target_chars=TRANSLATE_CHUNK_TARGET_CHARS, max_chars=TRANSLATE_CHUNK_MAX_CHARS):
+        super().__init__(convert_charrefs=False)
+        self.target_chars, self.max_chars = target_chars, max_chars
+        self.chunks = []
+        self._current = []
+        self._length = 0 # Characters in _current
+        self._closing = 0 # Characters of the end tags _cut would add
+        self._text = 0 # Visible characters in the current chunk
+        self._stack = [] # (tag, start tag text) of open elements
+
+    def _cut(self):
+        if not self._text: return # Markup-only chunks are merged into the next one
+        self.chunks.append(''.join(self._current) + ''.join(f"</{tag}>" for tag, _ in reversed(self._stack)))
+        self._current = [start for _, start in self._stack]
+        self._length = sum(map(len, self._current))
+        self._text = 0
+
+    def _room(self):
+        return self.max_chars - self._length - self._closing
+
+    def _append(self, piece, text=0):
+        self._current.append(piece)
+        self._length += len(piece)
+        self._text += text
+
+    def _fit(self, size):
+        # Cuts between inline runs when size more characters would push the chunk past max_chars
+        if self._text and size > self._room(): self._cut()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_ELEMENTS and self._text >= self.target_chars: self._cut()
+        start = self.get_starttag_text()
+        self._fit(len(start) + (0 if tag in VOID_ELEMENTS else len(tag) + 3))
+        self._append(start)
+        if tag not in VOID_ELEMENTS:
+            self._stack.append((tag, start))
+            self._closing += len(tag) + 3
+        elif tag == 'br' and self._text >= self.target_chars: self._cut()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS: self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not any(t == tag for t, _ in self._stack): return
+        while self._stack:
+            open_tag, _ = self._stack.pop()
+            self._closing -= len(open_tag) + 3 # Moves from the pending end tags into _current
+            self._append(f"</{open_tag}>")
+            if open_tag == tag: break
+        if tag in BLOCK_ELEMENTS and self._text >= self.target_chars: self._cut()
+
+    def handle_data(self, data):
+        while len(data) > self._room():
+            room = self._room()
+            cut = data.rfind(' ', 0, room) if room > 0 else -1
+            if cut <= 0:
+                if self._text:
+                    self._cut() # Start the run in a fresh chunk rather than break a word
+                    continue
+                cut = max(1, room) # One word longer than a whole chunk
+            self._append(data[:cut], len(data[:cut].strip()) or 1)
+            self._cut()
+            data = data[cut:]
+        self._append(data, len(data.strip()))
+
+    def handle_entityref(self, name):
+        self._fit(len(name) + 2)
+        self._append(f"&{name};", 1)
+
+    def handle_charref(self, name):
+        self._fit(len(name) + 3)
+        self._append(f"&#{name};", 1)
+
+    def close(self):
+        super().close()
+        tail = ''.join(self._current) + ''.join(f"</{tag}>" for tag, _ in reversed(self._stack))
+        if self._text or not self.chunks or len(self.chunks[-1]) + len(tail) > self.max_chars: self.chunks.append(tail)
+        elif tail: self.chunks[-1] += tail
+        self._current, self._stack, self._length, self._closing = [], [], 0, 0
+
+def split_html_blocks(html_content, target_chars=TRANSLATE_CHUNK_TARGET_CHARS, max_chars=TRANSLATE_CHUNK_MAX_CHARS):
+    splitter = HTMLBlockSplitter(target_chars, max_chars)
+    splitter.feed(html_content or '')
+    splitter.close()
+    return [chunk for chunk in splitter.chunks if chunk]
+
+def html_to_markup(html_content):
+    if not html_content: return ""
+    extractor = ArticleHTMLExtractor(fragment=True)
+    extractor.feed(html_content)
+    extractor.close()
+    return extractor.markup
+
+def split_markup_paragraphs(markup):
+    paragraphs = []
+    for paragraph in re.split(r'\n\s*\n', markup):
+        if not paragraph.strip(): continue
+        if len(paragraph) <= ARTICLE_PARAGRAPH_MAX_CHARS: paragraphs.append(paragraph); continue
+        current = ''
+        for line in paragraph.split('\n'):
+            if current and len(current) + len(line) > ARTICLE_PARAGRAPH_MAX_CHARS: paragraphs.append(current); current = line
+            else: current = f"{current}\n{line}" if current else line
+        if current: paragraphs.append(current)
+    return paragraphs or ['']
+
+def article_render_key(content, is_markup):
+    return hashlib.sha1((content or '').encode('utf-8')).hexdigest(), is_markup
+
+def get_rendered_article(content, is_markup=False):
+    with markdown_cache_lock: return markdown_cache.get(article_render_key(content, is_markup))
+
+@traced('article.render')
+def render_article_paragraphs(content, is_markup=False):
+    # Article body as one markup string per paragraph, memoized by content; runs on the background pool
+    paragraphs = get_rendered_article(content, is_markup)
+    tracer.count('markup_cache.hits' if paragraphs is not None else 'markup_cache.misses')
+    if paragraphs is None:
+        paragraphs = split_markup_paragraphs(content if is_markup else html_to_markup(content))
+        if markdown_cache.getsizeof(paragraphs) <= markdown_cache.maxsize: # LRUCache refuses a value bigger than the whole cache
+            with markdown_cache_lock: markdown_cache[article_render_key(content, is_markup)] = paragraphs
+    return paragraphs
+
+@traced('article.fetch')
+async def get_full_article_content_async(url):
+    # The HTTP cache holds the extracted details rather than the page, so a hit or a 304 skips extraction too
+    details = {"html_content": "", "image_url": None, "markup": ""}
+    entry = await background_service.run_blocking(http_cache.lookup, url) if http_cache else None
+    if http_cache and http_cache.is_fresh(entry, ARTICLE_CACHE_MAX_AGE_SECONDS):
+        await background_service.run_blocking(http_cache.record_hit, entry)
+        return json.loads(entry['body'])
+    try:
+        extractor = ArticleHTMLExtractor()
+        start = time.perf_counter()
+        async with work_queue.slot_async(label='article.fetch'), background_service.client.stream('GET', url, headers=HttpCache.conditional_headers(entry)) as response:
+            if response.status_code == 304 and entry:
+                await background_service.run_blocking(http_cache.record_hit, entry, time.perf_counter() - start)
+                return json.loads(entry['body'])
+            response.raise_for_status()
+            async for chunk in response.aiter_text():
+                extractor.feed(chunk)
+                if extractor.done: break # Nothing after .post-body is needed
+            network_bytes, validators = response.num_bytes_downloaded, (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            tracer.count('net.bytes', network_bytes)
+        extractor.close()
+        img = extractor.og_image or extractor.first_image
+        if img:
+            if img.startswith('//'): img = 'https:' + img
+            elif not img.startswith(('http://', 'https://')): img = None
+        details['image_url'] = img
+        details['html_content'] = extractor.html
+        details['markup'] = extractor.markup
+        if http_cache and details['html_content']:
+            body = json.dumps(details, ensure_ascii=False).encode('utf-8')
+            await background_service.run_blocking(http_cache.store, url, *validators, body, network_bytes, time.perf_counter() - start)
+    except asyncio.CancelledError: raise
+    except Exception as e:
+        print(f"Full content fetch error for {url}: {e}")
+        if entry: return json.loads(entry['body']) # Stale beats nothing when the network is down
+    return details
+
+@traced('article.translate')
+async def translate_html_async(html_content, lang, on_chunk=None):
+    # Paragraph chunks are looked up in the translation memory together and the misses translated in parallel, each
+    # one shared with concurrent callers. on_chunk(chunks) fires as each lands, with None for those still pending.
+    # A chunk that fails to translate falls back to the source paragraph instead of failing the whole article.
+    chunks = split_html_blocks(html_content)
+    translated = [None] * len(chunks)
+    remembered = await background_service.run_blocking(translation_memory.get_many, chunks, lang) if translation_memory else {}
+    translator = get_shared_translator() # One keep-alive client for every chunk, shared with the pack builds
+    slots = asyncio.Semaphore(TRANSLATE_MAX_CONCURRENCY)
+    async def translate_chunk(i, chunk):
+        result = remembered.get(chunk)
+        if result is None:
+            async with slots:
+                result = await article_requests.run(('translate', TranslationMemory.make_hash(chunk), lang),
+                                                    lambda: background_service.run_queued('article.translate', translate_chunk_sync, translator, chunk, lang))
+        translated[i] = result
+        if on_chunk: on_chunk(translated)
+    await asyncio.gather(*(translate_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+    return ''.join(translated)
+
+async def get_translated_article_async(url, lang, on_chunk=None):
+    # Returns (details, body HTML in lang); callers asking for the same url share one fetch, and the same paragraphs one translation
+    details = await article_requests.run(('fetch', url), lambda: get_full_article_content_async(url))
+    if lang == DEFAULT_CONTENT_LANG or not details.get('html_content'): return details, details.get('html_content', '')
+    return details, await translate_html_async(details['html_content'], lang, on_chunk)
+
+# --- Offline Search Index ---
+ARABIC_MARKS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]') # Harakat, Quranic marks and tatweel
+ARABIC_LETTER_FOLDS = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه'})
+ARABIC_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال') # Longest first; stripped only when two letters remain
+SEARCH_TOKEN_RE = re.compile(r'[^\W_]+')
+HTML_TAG_RE = re.compile(r'<[^>]*>')
+
+def tokenize(text):
+    # Same folding for documents and queries: NFKC + casefold, Arabic diacritics and letter variants unified, article prefixes dropped
+    text = ARABIC_MARKS_RE.sub('', unicodedata.normalize('NFKC', text or '').casefold()).translate(ARABIC_LETTER_FOLDS)
+    tokens = SEARCH_TOKEN_RE.findall(text)
+    for i, token in enumerate(tokens):
+        for prefix in ARABIC_PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+                tokens[i] = token[len(prefix):]
+                break
+    return tokens
+
+def html_to_text(html_content):
+    return html.unescape(HTML_TAG_RE.sub(' ', html_content or ''))
+
+class SearchIndex:
+    # Inverted index for one content language: term -> {link: weighted term frequency}, ranked with BM25
+    def __init__(self, lang, k1=1.2, b=0.75):
+        self.lang, self.k1, self.b = lang, k1, b
+        self.lock = threading.Lock()
+        self.postings = {}
+        self.docs = {} # link -> {'meta': post, 'fields': {field: Counter}, 'length': weighted token count}
+        self.ids = {} # post id -> link, for evictions that only know ids
+        self.total_length = 0
+        self._vocabulary = None # Sorted terms for prefix lookups, rebuilt lazily after the index changes
+
+    def _unindex_locked(self, link, doc):
+        for field, counts in doc['fields'].items():
+            weight = SEARCH_FIELD_WEIGHTS[field]
+            for term, count in counts.items():
+                postings = self.postings[term]
+                postings[link] -= weight * count
+                if postings[link] <= 0: del postings[link]
+                if not postings: del self.postings[term]
+        self.total_length -= doc['length']
+
+    def _index_locked(self, link, doc):
+        length = 0
+        for field, counts in doc['fields'].items():
+            weight = SEARCH_FIELD_WEIGHTS[field]
+            for term, count in counts.items():
+                postings = self.postings.setdefault(term, {})
+                postings[link] = postings.get(link, 0) + weight * count
+                length += weight * count
+        doc['length'] = length
+        self.total_length += length
+        self._vocabulary = None
+
+    def update_document(self, link, meta, **fields):
+        # Replaces the given fields (title, snippet, body) of one document and keeps the others
+        if not link: return
+        counted = {field: Counter(tokenize(text)) for field, text in fields.items() if text is not None}
+        with self.lock:
+            doc = self.docs.get(link)
+            if doc is None: doc = self.docs[link] = {'meta': meta, 'fields': {}, 'length': 0}
+            else:
+                self._unindex_locked(link, doc)
+                doc['meta'] = meta or doc['meta']
+            doc['fields'].update(counted)
+            if meta and meta.get('id') is not None: self.ids[meta['id']] = link
+            self._index_locked(link, doc)
+
+    def add_posts(self, posts):
+        for post in posts: self.update_document(post.get('link'), post, title=post.get('title') or '', snippet=post.get('snippet') or '')
+
+    def remove_ids(self, ids):
+        # Evicted cache posts leave the index unless their offline body is still on disk
+        with self.lock:
+            for post_id in ids:
+                link = self.ids.get(post_id)
+                doc = self.docs.get(link)
+                if doc is None or 'body' in doc['fields']: continue
+                self._unindex_locked(link, doc)
+                del self.docs[link], self.ids[post_id]
+                self._vocabulary = None
+
+    def _expand_locked(self, prefix):
+        if self._vocabulary is None: self._vocabulary = sorted(self.postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + SEARCH_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix): break
+            terms.append(term)
+        return terms
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms: return []
+        prefix_last = not query[-1:].isspace() # The last word is still being typed
+        with self.lock:
+            count = len(self.docs)
+            if not count: return []
+            average_length = self.total_length / count or 1
+            scores, matched = {}, Counter()
+            for i, term in enumerate(terms):
+                expansions = self._expand_locked(term) if prefix_last and i == len(terms) - 1 else [term]
+                best = {} # A document counts once per query word, with its best-scoring expansion
+                for expansion in expansions:
+                    postings = self.postings.get(expansion)
+                    if not postings: continue
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    if expansion != term: idf *= 0.8 # Exact words rank above completions
+                    for link, tf in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self.docs[link]['length'] / average_length)
+                        score = idf * tf * (self.k1 + 1) / (tf + norm)
+                        if score > best.get(link, 0): best[link] = score
+                for link, score in best.items():
+                    scores[link] = scores.get(link, 0) + score
+                    matched[link] += 1
+            top = heapq.nlargest(limit, scores, key=lambda link: (matched[link], scores[link]))
+            return [self.docs[link]['meta'] for link in top]
+
+    def __len__(self): return len(self.docs)
+
+    def memory_bytes(self):
+        with self.lock: return estimate_size([self.postings, self.docs, self.ids, self._vocabulary])
+
+search_indexes_lock = threading.Lock()
+
+def build_search_index(lang):
+    start = time.perf_counter()
+    index = SearchIndex(lang)
+    display_cache = get_list_display_cache(lang)
+    if display_cache: index.add_posts(display_cache)
+    for fav in list(favorites.values()):
+        if fav.get('lang') != lang: continue
+        content = load_offline_article_sync(fav.get('url'), lang, touch=False)
+        if content: index_offline_body(index, fav.get('url'), lang, content)
+    print(f"Search index {lang}: {len(index)} articles in {time.perf_counter() - start:.3f}s")
+    return index
+
+def get_search_index(lang):
+    with search_indexes_lock:
+        index = search_indexes.get(lang)
+        built = index is None
+        if built: index = search_indexes[lang] = build_search_index(lang)
+    if built: request_cache_enforce() # Outside the lock: enforcing inline may shed search indexes, which takes it again
+    return index
+
+def invalidate_search_index(lang=None):
+    # Dropped indexes are rebuilt from the caches on the next search
+    with search_indexes_lock:
+        if lang is None: search_indexes.clear()
+        else: search_indexes.pop(lang, None)
+
+def update_search_index(lang, new_posts, removed_ids=()):
+    with search_indexes_lock: index = search_indexes.get(lang) # Waits out a build in progress
+    if index is None: return # Not built yet; the first search indexes the current cache
+    if removed_ids: index.remove_ids(removed_ids)
+    if new_posts: index.add_posts(new_posts)
+
+def index_offline_body(index, url, lang, content):
+    display_cache = get_list_display_cache(lang)
+    post = (display_cache.get_by_link(url) if display_cache else None) or favorites.get((url, lang)) or offline_store.get_meta(url)
+    meta = {'id': post.get('id'), 'link': url, 'title': post.get('title', ''), 'snippet': post.get('snippet', ''), 'image_url': post.get('image_url', '')}
+    index.update_document(url, meta, title=meta['title'], snippet=meta['snippet'], body=html_to_text(content))
+
+def index_offline_article(url, lang, content):
+    with search_indexes_lock: index = search_indexes.get(lang)
+    if index is not None: index_offline_body(index, url, lang, content)
+
+@traced('search.query')
+def search_articles_sync(query, lang, limit=SEARCH_RESULT_LIMIT):
+    return get_search_index(lang).search(query, limit)
+
+# --- Language List Model ---
+def language_search_key(text):
+    # Casefolded with accents dropped, so "bokmal" finds "Norwegian Bokmål"
+    return ''.join(c for c in unicodedata.normalize('NFKD', text.casefold()) if not unicodedata.combining(c))
+
+class LanguageModel:
+    # Languages sorted once with precomputed (name, code) search keys each. A query matches either key on its own, never
+    # across the two. When the query only grew, filtering narrows the previous matches instead of rescanning everything.
+    def __init__(self, languages):
+        self.entries = sorted(((code, name, (language_search_key(name), language_search_key(code))) for code, name in languages.items()), key=lambda entry: entry[2])
+        self._query, self._matches = '', self.entries
+
+    def filter(self, query):
+        query = language_search_key(query.strip())
+        candidates = self._matches if query.startswith(self._query) else self.entries
+        self._query, self._matches = query, ([entry for entry in candidates if query in entry[2][0] or query in entry[2][1]] if query else self.entries)
+        return self._matches
+
+def get_language_model():
+    global language_model
+    if language_model is None: language_model = LanguageModel(ALL_LANGUAGES)
+    return language_model
+
+# --- Memory Budget ---
+class CacheManager:
+    # The in-memory caches register in shedding order, coldest first, each with a size estimate and a way to let go.
+    # enforce() sheds down the list until the total fits the budget; trim('pause') drops every cold cache outright and
+    # trim('low_memory') everything that can be dropped. Shed caches are rebuilt from disk when next needed.
+    def __init__(self, budget=MEMORY_BUDGET_BYTES):
+        self.budget = budget
+        self._caches = [] # (name, size(), shed() or None, cold)
+        self._lock = threading.Lock()
+        self.sheds = Counter()
+        self.last_trim = None
+
+    def register(self, name, size, shed=None, cold=False):
+        self._caches.append((name, size, shed, cold))
+
+    @staticmethod
+    def _measure(size):
+        try: return size()
+        except RuntimeError: return 0 # Changed size while it was being measured; counted on the next pass
+
+    def sizes(self):
+        return {name: self._measure(size) for name, size, _, _ in self._caches}
+
+    def _shed_locked(self, name, shed):
+        shed()
+        self.sheds[name] += 1
+        tracer.count(f"cache_manager.shed.{name}")
+
+    @traced('cache_manager.enforce')
+    def enforce(self):
+        with self._lock:
+            sizes = self.sizes()
+            total = sum(sizes.values())
+            for name, size, shed, _ in self._caches:
+                if total <= self.budget: break
+                if shed is None or not sizes[name]: continue
+                self._shed_locked(name, shed)
+                total -= sizes[name] - self._measure(size) # Releasing a modified index frees nothing
+            return total
+
+    @traced('cache_manager.trim')
+    def trim(self, reason):
+        with self._lock:
+            for name, _, shed, cold in self._caches:
+                if shed and (cold or reason == 'low_memory'): self._shed_locked(name, shed)
+            self.last_trim = (reason, time.time())
+        total = self.enforce()
+        print(f"Memory trim ({reason}): {total / 2**20:.1f} MB of {self.budget / 2**20:.0f} MB in use")
+        return total
+
+    def get_report(self):
+        sizes = self.sizes()
+        return {'budget': self.budget, 'total': sum(sizes.values()), 'caches': sizes, 'sheds': dict(self.sheds),
+                'last_trim': self.last_trim[0] if self.last_trim else None}
+
+def get_debug_report():
+    # The memory report plus the hit/miss counters of the disk-backed caches; the store queries run on the worker pool
+    report = cache_manager.get_report()
+    report['stores'] = {name: store.get_stats() for name, store in (('translation memory', translation_memory), ('thumbnails', thumbnail_cache),
+                                                                    ('offline articles', offline_store), ('http cache', http_cache)) if store}
+    return report
+
+def is_inactive_language(lang):
+    return lang != current_language
+
+def shed_markdown_cache():
+    with markdown_cache_lock: markdown_cache.clear()
+
+def shed_language_caches(inactive):
+    with language_caches_lock:
+        for lang in [lang for lang in language_caches if is_inactive_language(lang) == inactive]:
+            if inactive: del language_caches[lang]
+            else: language_caches[lang].release()
+
+def shed_search_indexes(inactive):
+    with search_indexes_lock:
+        for lang in [lang for lang in search_indexes if is_inactive_language(lang) == inactive]: del search_indexes[lang]
+
+def language_caches_bytes(inactive):
+    return sum(cache.memory_bytes() for lang, cache in list(language_caches.items()) if is_inactive_language(lang) == inactive)
+
+def search_indexes_bytes(inactive):
+    return sum(index.memory_bytes() for lang, index in list(search_indexes.items()) if is_inactive_language(lang) == inactive)
+
+cache_manager = CacheManager()
+cache_manager.register('markdown_cache', lambda: markdown_cache.currsize, shed_markdown_cache, cold=True)
+cache_manager.register('search_indexes.other', lambda: search_indexes_bytes(True), lambda: shed_search_indexes(True), cold=True)
+cache_manager.register('language_caches.other', lambda: language_caches_bytes(True), lambda: shed_language_caches(True), cold=True)
+cache_manager.register('search_index.current', lambda: search_indexes_bytes(False), lambda: shed_search_indexes(False))
+cache_manager.register('language_cache.current', lambda: language_caches_bytes(False), lambda: shed_language_caches(False))
+cache_manager.register('base_cache', base_cache.memory_bytes, base_cache.release)
+
+def request_cache_enforce():
+    # Measuring walks the caches, so it runs on the worker pool rather than in the caller (often the UI thread)
+    if background_service: background_service.submit(cache_manager.enforce)
+    else: cache_manager.enforce()
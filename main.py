@@ -2,142 +2,67 @@
 # Collepedia Mobile App - Final Integrated Version
 # Developed by Nanasoft Technologies Agency - CEO AbdulRahman Muhammad Rabie Ahmed
 
+import core # First, so core.STARTUP_T0 also covers the Kivy imports below
 import os
-import json
-import asyncio
-import threading
-import shutil
-import random
+import time
 from functools import partial
 from kivy.app import App
-from kivy.uix.screenmanager import ScreenManager, Screen, FadeTransition
+from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.modalview import ModalView
+from kivy.uix.recycleview import RecycleView
 from kivy.properties import StringProperty, ListProperty, ObjectProperty, NumericProperty, BooleanProperty
 from kivy.clock import Clock, mainthread
-from kivy.lang import Builder
-from kivy.utils import get_color_from_hex, platform
+from kivy.cache import Cache
 from kivy.core.window import Window
+from kivy.lang import Builder
+from kivy.metrics import dp
 from kivymd.app import MDApp
-from kivymd.uix.list import TwoLineAvatarIconListItem, BaseListItem, IRightBodyTouch
+from kivymd.uix.list import TwoLineAvatarIconListItem, BaseListItem
+from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.selectioncontrol import MDCheckbox
 from kivymd.uix.dialog import MDDialog
-from kivymd.uix.button import MDFlatButton, MDRaisedButton, MDIconButton
-from kivymd.uix.spinner import MDSpinner
+from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.label import MDLabel
-from kivymd.uix.scrollview import MDScrollView
 from kivymd.uix.toolbar import MDTopAppBar
-from kivymd.uix.navigationdrawer import MDNavigationLayout
-from kivymd.uix.card import MDCard
-from kivymd.uix.bottomnavigation import MDBottomNavigation, MDBottomNavigationItem
-from kivymd.theming import ThemableBehavior
 from kivymd.uix.snackbar import Snackbar
-from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.textfield import MDTextField
 
-from collepedia import CollepediaClient
-from deep_translator import GoogleTranslator
-import requests
-from bs4 import BeautifulSoup
-from plyer import notification
-import html2text
-from urllib.parse import urlparse, urljoin, quote
-import pycountry
-from cachetools import LRUCache
-
-# --- Configuration ---
-APP_NAME = "Collepedia Mobile"
-APP_VERSION = "4.0"
-CACHE_DIR_NAME = "app_data"
-BASE_CACHE_FILE_NAME = "ar_base_cache.json"
-LANG_CACHE_PREFIX = "list_cache_"
-OFFLINE_ARTICLE_DIR_NAME = "offline_articles"
-SETTINGS_FILE_NAME = "settings.json"
-LAST_POST_FILE_NAME = "last_post.json"
-FAVORITES_FILE_NAME = "favorites.json"
-
-DEFAULT_CONTENT_LANG = 'ar'
-DEFAULT_UI_LANG = 'en'
-
-MAX_ARTICLES_IN_BASE_CACHE = 500
-ARTICLES_PER_PAGE_IN_LIST = 25
-BACKGROUND_TASK_INTERVAL_SECONDS = 3600 # 1 hour
-MARKDOWN_CACHE_SIZE = 50
-FALLBACK_IMAGE = 'atlas://kivymd/images/logo/kivymd-icon-256'
-
-ALL_LANGUAGES = {}
-try:
-    for lang in pycountry.languages:
-        code = getattr(lang, 'alpha_2', None)
-        if code: ALL_LANGUAGES[code] = lang.name
-except Exception as e:
-    print(f"Could not load pycountry languages: {e}")
-    ALL_LANGUAGES = {'en': 'English', 'ja': 'Japanese', 'es': 'Spanish', 'fr': 'French', 'de': 'German', 'ar': 'Arabic'}
-
-# --- Global Variables ---
-collepedia_client = CollepediaClient(user_agent=f"{APP_NAME}/{APP_VERSION}")
-app_data_dir = ""
-BASE_CACHE_FILE = ""
-OFFLINE_ARTICLE_DIR = ""
-SETTINGS_FILE = ""
-FAVORITES_FILE = ""
-
-base_cache = []
-language_caches = {}
-downloaded_languages = []
-current_language = DEFAULT_CONTENT_LANG
-last_post_id = None
-favorites = []
-markdown_cache = LRUCache(maxsize=MARKDOWN_CACHE_SIZE)
-
-# --- Helper Functions ---
-def load_json_safe(file_path, default_value):
-    if not os.path.exists(file_path): return default_value
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f: return json.load(f)
-    except Exception as e: print(f"Error loading {file_path}: {e}"); return default_value
-
-def save_json_safe(data, file_path):
-    try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f: json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e: print(f"Error saving {file_path}: {e}")
-
-def translate_sync(text, target_lang):
-    if not text or target_lang == DEFAULT_CONTENT_LANG: return text or ""
-    try:
-        translated = GoogleTranslator(source='auto', target=target_lang).translate(text)
-        return translated or ""
-    except Exception as e:
-        print(f"Translate error ({target_lang}): {e}")
-        return f"(Translation Failed)"
-
-async def get_full_article_content_async(url):
-    details = {"html_content": "", "image_url": None}
-    try:
-        response = await asyncio.to_thread(requests.get, url, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml')
-        img_tag = soup.find("meta", property="og:image")
-        img = img_tag['content'] if img_tag else None
-        if not img:
-            first_img = soup.select_one('.post-body img')
-            if first_img: img = first_img.get('src')
-        if img:
-            if img.startswith('//'): img = 'https:' + img
-            elif not img.startswith(('http://', 'https://')): img = None
-        details['image_url'] = img
-        post_body = soup.select_one('.post-body')
-        if post_body: details['html_content'] = str(post_body)
-    except Exception as e: print(f"Full content fetch error for {url}: {e}")
-    return details
-
-# --- Kivy UI Definition (KV Language) ---
+# plyer is imported where first used to keep it off the startup path
+# Module state that core rebinds (app_data_dir, background_service, base_cache, favorites, thumbnail_cache) is read as core.<name>
+from core import (APP_NAME, DEFAULT_CONTENT_LANG, ACTIVE_TRANSLATION_LANGUAGES, ARTICLES_PER_PAGE_IN_LIST,
+                  FALLBACK_IMAGE, LOAD_MORE_SCROLL_THRESHOLD, THUMBNAIL_SIZE_DP, SEARCH_DEBOUNCE_SECONDS, LANGUAGE_FILTER_DEBOUNCE_SECONDS,
+                  PREFETCH_TOP_ARTICLES, PREFETCH_CHECKPOINT_FILE_NAME, OFFLINE_CLEAR_AGE_DAYS, TRACE_ENV_VAR, TRACE_FILE_NAME,
+                  TRACE_FLUSH_INTERVAL_SECONDS, FRAME_STALL_THRESHOLD_MS, tracer, traced, persistence, cache_manager, get_debug_report, mark_startup_phase, save_startup_timings,
+                  PRIORITY_INTERACTIVE, PRIORITY_USER, PRIORITY_PREFETCH, work_queue,
+                  initialize_paths, initialize_background, load_all_data, save_settings, get_list_display_cache, delete_language_pack,
+                  is_favorite_sync, add_favorite_sync, remove_favorite_sync, get_favorite_articles_sync, load_offline_article_sync,
+                  save_article_offline_async, clear_offline_articles_sync, OfflinePrefetchJob, resume_offline_prefetch_job, translate_sync,
+                  ALL_LANGUAGES, download_languages_thread, fetch_base_cache_sync, SyncScheduler, get_translated_article_async, get_rendered_article,
+                  render_article_paragraphs, search_articles_sync, get_language_model)
+
+mark_startup_phase('imports')
+
+def run_background_tasks_thread():
+    app = App.get_running_app()
+    new_posts = fetch_base_cache_sync(incremental=True)
+    if not new_posts or not app: return new_posts
+    app.send_notification(new_posts[0])
+
+    def apply_on_main_thread(dt):
+        app.last_post_id = core.base_cache[0].get('id')
+        app.save_app_state()
+        app.reload_data_and_refresh_ui()
+    Clock.schedule_once(apply_on_main_thread)
+    return new_posts
+
 KV_STRING = '''
 #:import get_color_from_hex kivy.utils.get_color_from_hex
 #:import FadeTransition kivy.uix.screenmanager.FadeTransition
 #:import partial functools.partial
 
 <ArticleListItem>:
+    on_release: app.open_article(self)
     ImageLeftWidget:
         source: root.image_source if root.image_source else app.fallback_image
         radius: [12,]
@@ -156,20 +81,83 @@ KV_STRING = '''
         opacity: 1 if (root.can_download or root.can_delete) else 0
         on_release: app.handle_language_download_delete(root.lang_code, root.is_downloaded)
 
+<ArticleRecycleView>:
+    key_viewclass: 'viewclass'
+    RecycleBoxLayout:
+        default_size: None, dp(72)
+        default_size_hint: 1, None
+        size_hint_y: None
+        height: self.minimum_height
+        orientation: 'vertical'
+
+<SearchDialogContent>:
+    orientation: 'vertical'
+    size_hint_y: None
+    height: dp(420)
+    MDTextField:
+        id: query_field
+        hint_text: "Search titles and saved articles"
+        size_hint_y: None
+        height: dp(56)
+        on_text: app.on_search_text(self.text)
+    ArticleRecycleView:
+        id: results
+
+<LanguageRecycleView>:
+    viewclass: 'LanguageListItem'
+    RecycleBoxLayout:
+        default_size: None, dp(72)
+        default_size_hint: 1, None
+        size_hint_y: None
+        height: self.minimum_height
+        orientation: 'vertical'
+
+<ArticleParagraph>:
+    markup: True
+    size_hint_y: None
+    padding: dp(20), dp(6)
+    text_size: self.width, None
+    height: self.texture_size[1]
+
+<ArticleBodyView>:
+    viewclass: 'ArticleParagraph'
+    RecycleBoxLayout:
+        default_size: None, None
+        default_size_hint: 1, None
+        size_hint_y: None
+        height: self.minimum_height
+        orientation: 'vertical'
+
+<EmptyListLabel@MDLabel>:
+    halign: 'center'
+    theme_text_color: "Secondary"
+    size_hint_y: None
+    height: dp(72)
+
 <RightCheckbox@MDCheckbox>:
     pos_hint: {'center_y': .5}
     _no_ripple_effect: True
 
 <LoadingSpinnerPopup@ModalView>:
     size_hint: None, None
-    size: dp(120), dp(120)
+    size: dp(280), dp(150)
     background_color: 0, 0, 0, 0.5
     border_radius: [16,]
-    MDSpinner:
-        size_hint: None, None
-        size: dp(46), dp(46)
-        pos_hint: {'center_x': 0.5, 'center_y': 0.5}
-        active: True
+    MDBoxLayout:
+        orientation: 'vertical'
+        padding: dp(16)
+        spacing: dp(12)
+        MDSpinner:
+            size_hint: None, None
+            size: dp(46), dp(46)
+            pos_hint: {'center_x': 0.5}
+            active: True
+        MDLabel:
+            text: root.status_text
+            halign: 'center'
+            font_style: 'Caption'
+            theme_text_color: 'Custom'
+            text_color: 1, 1, 1, 1
 
 MDBoxLayout:
     orientation: 'vertical'
@@ -180,7 +168,7 @@ MDBoxLayout:
         md_bg_color: app.theme_cls.primary_color
         specific_text_color: app.theme_cls.text_color
         left_action_items: [["menu", lambda x: app.root.ids.nav_layout.set_state("open")]]
-        right_action_items: [["magnify", lambda x: app.open_search_dialog()]]
+        right_action_items: [["refresh", lambda x: app.refresh_now()], ["magnify", lambda x: app.open_search_dialog()]]
 
     MDNavigationLayout:
         id: nav_layout
@@ -251,11 +239,61 @@ MDBoxLayout:
 
 '''
 # --- Widget Classes ---
+def update_recycle_data(view, rows):
+    # Item assignment refreshes just that row, so only rows that actually changed are re-rendered
+    data = view.data
+    for i, row in enumerate(rows[:len(data)]):
+        if data[i] != row: data[i] = row
+    if len(rows) < len(data): del data[len(rows):]
+    elif len(rows) > len(data): data.extend(rows[len(data):])
+
 class ArticleListItem(TwoLineAvatarIconListItem):
     article_data = ObjectProperty(None)
     list_data = ObjectProperty(None)
     image_source = StringProperty('')
 
+class ArticleRecycleView(RecycleView):
+    # Rows are plain dicts; only the visible ones get an ArticleListItem, and more pages are appended near the bottom
+    row_limit = NumericProperty(ARTICLES_PER_PAGE_IN_LIST)
+    total_rows = NumericProperty(0)
+    __events__ = ('on_load_more',)
+
+    def set_rows(self, rows, total_rows):
+        self.total_rows = total_rows
+        update_recycle_data(self, rows)
+
+    def on_scroll_y(self, instance, value):
+        if value <= LOAD_MORE_SCROLL_THRESHOLD and self.row_limit < self.total_rows:
+            self.row_limit = min(self.row_limit + ARTICLES_PER_PAGE_IN_LIST, self.total_rows)
+            self.dispatch('on_load_more')
+
+    def on_load_more(self): pass
+
+def make_article_row(item_data, article_data, default_snippet=''):
+    image_url = item_data.get('image_url', '') or ''
+    return {'viewclass': 'ArticleListItem', 'text': item_data.get('title', 'No Title'),
+            'secondary_text': (item_data.get('snippet', default_snippet) or '')[:120] + '...',
+            'image_source': core.thumbnail_cache.get(image_url) if core.thumbnail_cache else image_url,
+            'list_data': item_data, 'article_data': article_data}
+
+def make_empty_row(text):
+    return {'viewclass': 'EmptyListLabel', 'text': text}
+
+class SearchDialogContent(BoxLayout): pass
+
+class ArticleParagraph(MDLabel):
+    def on_ref_press(self, ref):
+        try:
+             import webbrowser
+             webbrowser.open(ref)
+        except Exception as e:
+             print(f"Error opening link {ref}: {e}")
+
+class ArticleBodyView(RecycleView):
+    # One label per paragraph and only the visible ones exist, so no texture grows with the article's length
+    def set_paragraphs(self, paragraphs):
+        update_recycle_data(self, [{'text': p} for p in paragraphs]) # Streamed translations mostly append, earlier paragraphs stay
+
 class LanguageListItem(BaseListItem):
     lang_code = StringProperty('')
     lang_name = StringProperty('')
@@ -265,11 +303,30 @@ class LanguageListItem(BaseListItem):
     can_download = BooleanProperty(False)
     can_delete = BooleanProperty(False)
 
+class LanguageRecycleView(RecycleView):
+    def set_rows(self, rows):
+        update_recycle_data(self, rows)
+
 class RightCheckbox(MDCheckbox):
     pass
 
 class LoadingSpinnerPopup(ModalView):
-    pass
+    status_text = StringProperty('')
+
+class LanguagePickerContent(MDBoxLayout):
+    # One checkbox per language that can still be downloaded, so several packs can be built in one pass
+    def __init__(self, languages, **kwargs):
+        super().__init__(orientation='vertical', size_hint_y=None, height=dp(48) * len(languages), **kwargs)
+        self.checkboxes = {}
+        for lang_code, lang_name in languages:
+            row = MDBoxLayout(size_hint_y=None, height="48dp", spacing="12dp")
+            self.checkboxes[lang_code] = MDCheckbox(size_hint=(None, None), size=("48dp", "48dp"))
+            row.add_widget(self.checkboxes[lang_code])
+            row.add_widget(MDLabel(text=f"{lang_name} ({lang_code.upper()})"))
+            self.add_widget(row)
+
+    def selected(self):
+        return [lang_code for lang_code, checkbox in self.checkboxes.items() if checkbox.active]
 
 # --- Screen Classes ---
 class BaseScreen(Screen):
@@ -290,8 +347,8 @@ class HomeScreen(BaseScreen):
     article_list_widget = ObjectProperty(None)
     def build_content(self):
         layout = MDBoxLayout(orientation='vertical', id='home_screen_layout')
-        self.article_list_widget = MDList(id='home_article_list')
-        layout.add_widget(MDScrollView(self.article_list_widget))
+        self.article_list_widget = ArticleRecycleView(on_load_more=lambda x: self.app.populate_article_list(x))
+        layout.add_widget(self.article_list_widget)
         self.add_widget(layout)
 
     def refresh_content(self):
@@ -301,8 +358,8 @@ class FavoritesScreen(BaseScreen):
     fav_list_widget = ObjectProperty(None)
     def build_content(self):
         layout = MDBoxLayout(orientation='vertical', id='fav_screen_layout')
-        self.fav_list_widget = MDList(id='fav_article_list')
-        layout.add_widget(MDScrollView(self.fav_list_widget))
+        self.fav_list_widget = ArticleRecycleView(on_load_more=lambda x: self.app.populate_favorites_list(x))
+        layout.add_widget(self.fav_list_widget)
         self.add_widget(layout)
 
     def refresh_content(self):
@@ -310,44 +367,31 @@ class FavoritesScreen(BaseScreen):
 
 class ArticleScreen(BaseScreen):
     toolbar = ObjectProperty(None)
-    content_label = ObjectProperty(None)
+    body_view = ObjectProperty(None)
+    render_generation = 0 # Bumped per update so a slow render cannot overwrite newer content
     def build_content(self):
         layout = MDBoxLayout(orientation='vertical', id='article_screen_layout')
         self.toolbar = MDTopAppBar(title="Article", elevation=2,
                                     left_action_items=[["arrow-left", lambda x: self.app.switch_screen('home')]],
                                     right_action_items=[["heart-outline", lambda x: self.app.toggle_favorite()]]
                                     )
-        self.content_label = MDLabel(padding="20dp", markup=True, size_hint_y=None, on_ref_press=self.open_link)
-        self.content_label.bind(texture_size=self.content_label.setter('height'))
+        self.body_view = ArticleBodyView()
         layout.add_widget(self.toolbar)
-        layout.add_widget(MDScrollView(self.content_label, id='article_scroll'))
+        layout.add_widget(self.body_view)
         self.add_widget(layout)
 
-    def update_content(self, title, content_html, is_favorite):
+    @traced('ui.update_content')
+    def update_content(self, title, content, is_favorite, is_markup=False, reset_scroll=False):
         self.toolbar.title = title[:40] + ('...' if len(title) > 40 else '')
-        self.content_label.text = self._basic_html_to_markup(content_html)
         self.toolbar.right_action_items = [[("heart" if is_favorite else "heart-outline"), lambda x: self.app.toggle_favorite()]]
+        if reset_scroll: self.body_view.scroll_y = 1
+        self.render_generation += 1
+        paragraphs = get_rendered_article(content, is_markup)
+        if paragraphs is not None: self.show_paragraphs(self.render_generation, paragraphs)
+        else: core.background_service.submit(render_article_paragraphs, content, is_markup, callback=partial(self.show_paragraphs, self.render_generation))
 
-    def _basic_html_to_markup(self, html_content):
-        # Very basic conversion for MDLabel, consider html2text for better results if needed
-        if not html_content: return ""
-        markup = html_content.replace('<p>', '').replace('</p>', '\n').replace('<br>', '\n').replace('<br/>', '\n')
-        markup = markup.replace('<b>', '[b]').replace('</b>', '[/b]')
-        markup = markup.replace('<i>', '[i]').replace('</i>', '[/i]')
-        # Remove images for now, handle links
-        soup = BeautifulSoup(markup, 'lxml')
-        for img in soup.find_all('img'): img.decompose()
-        for a in soup.find_all('a'):
-             href = a.get('href', '#')
-             a.replace_with(f'[ref={href}][color=0000ff]{a.get_text()}[/color][/ref]')
-        return soup.get_text() # Get text after processing tags
-
-    def open_link(self, instance, ref):
-        try:
-             import webbrowser
-             webbrowser.open(ref)
-        except Exception as e:
-             print(f"Error opening link {ref}: {e}")
+    def show_paragraphs(self, generation, paragraphs):
+        if generation == self.render_generation: self.body_view.set_paragraphs(paragraphs)
 
     def refresh_content(self): pass
 
@@ -357,21 +401,36 @@ class SettingsScreen(BaseScreen):
         layout = MDBoxLayout(orientation='vertical', padding="20dp", spacing="20dp")
         layout.add_widget(MDLabel(text="Manage Content Languages", font_style="H6", adaptive_height=True, halign='center'))
         self.filter_field = MDTextField(hint_text="Filter languages...", on_text_validate=self.filter_languages, size_hint_y=None, height="48dp")
+        self._filter_trigger = Clock.create_trigger(lambda dt: self.filter_languages(self.filter_field), LANGUAGE_FILTER_DEBOUNCE_SECONDS)
+        self.filter_field.bind(text=lambda instance, value: self._filter_trigger())
         layout.add_widget(self.filter_field)
-        self.language_list = MDList(id='language_list_widget')
-        layout.add_widget(MDScrollView(self.language_list))
+        self.language_list = LanguageRecycleView()
+        layout.add_widget(self.language_list)
+        layout.add_widget(MDRaisedButton(text="Download Several Languages", on_release=lambda x: self.app.open_language_picker(), pos_hint={'center_x': 0.5}, size_hint_y=None, height="48dp"))
+        self.prefetch_button = MDRaisedButton(text=self.app.prefetch_status, on_release=lambda x: self.app.toggle_offline_prefetch(), pos_hint={'center_x': 0.5}, size_hint_y=None, height="48dp")
+        self.app.bind(prefetch_status=lambda instance, value: setattr(self.prefetch_button, 'text', value))
+        layout.add_widget(self.prefetch_button)
         layout.add_widget(MDRaisedButton(text="Clear Offline Articles Cache", on_release=lambda x: self.app.clear_offline_cache(), pos_hint={'center_x': 0.5}, size_hint_y=None, height="48dp"))
+        if tracer.enabled: layout.add_widget(MDRaisedButton(text="Debug Report", on_release=lambda x: self.app.show_debug_report(), pos_hint={'center_x': 0.5}, size_hint_y=None, height="48dp"))
         self.add_widget(layout)
 
     def refresh_content(self):
-         Clock.schedule_once(lambda dt: self.app.populate_language_list(self.language_list, self.filter_field.text.lower()))
+        self.app.populate_language_list(self.language_list, self.filter_field.text)
 
     def filter_languages(self, instance):
-        self.app.populate_language_list(self.language_list, instance.text.lower())
+        self.app.populate_language_list(self.language_list, instance.text)
 
 # --- Main KivyMD App Class ---
 class CollepediaApp(MDApp):
     dialog = None
+    search_dialog = None
+    search_query = ''
+    search_generation = 0 # Bumped per query so results for stale keystrokes are dropped
+    article_future = None # In-flight article load, cancelled when another article is opened
+    article_generation = 0 # Bumped on every open so late results for a superseded article are dropped
+    prefetch_job = None
+    prefetch_future = None
+    prefetch_status = StringProperty("Make Articles Available Offline")
     title = StringProperty(APP_NAME)
     current_article = ObjectProperty(None)
     current_language = StringProperty(DEFAULT_CONTENT_LANG)
@@ -384,18 +443,41 @@ class CollepediaApp(MDApp):
         self.theme_cls.theme_style = "Light"
         self.theme_cls.primary_palette = "BlueGray"
         self.theme_cls.accent_palette = "Indigo"
+        mark_startup_phase('build')
         initialize_paths(self.user_data_dir)
-        initialize_background()
-        return Builder.load_string(KV_STRING)
+        self._refresh_thumbnails_trigger = Clock.create_trigger(self.refresh_article_rows, 0.25)
+        self._search_trigger = Clock.create_trigger(self.run_search, SEARCH_DEBOUNCE_SECONDS)
+        self.sync_scheduler = SyncScheduler(run_background_tasks_thread)
+        root = Builder.load_string(KV_STRING)
+        mark_startup_phase('kv_loaded')
+        return root
 
     def on_start(self):
-        self.load_app_state()
+        self.load_app_state(load_caches=False) # Settings only; caches load after the first frame
         self.root.ids.screen_manager.current = 'home'
-        Clock.schedule_once(self.initial_load, 1)
-        Clock.schedule_interval(self.run_background_kivy, BACKGROUND_TASK_INTERVAL_SECONDS)
-
-    def load_app_state(self):
-        settings = load_all_data()
+        Window.bind(on_memorywarning=self.on_low_memory) # Raised by the platform (Android onLowMemory, iOS memory warnings)
+        mark_startup_phase('on_start')
+        Clock.schedule_once(self.on_first_frame, 0) # A zero timeout runs after the next frame is drawn
+
+    def on_first_frame(self, dt):
+        mark_startup_phase('first_frame')
+        initialize_background(int(dp(THUMBNAIL_SIZE_DP)), dispatch=lambda fn: Clock.schedule_once(lambda dt: fn()))
+        if core.thumbnail_cache: core.thumbnail_cache.on_ready = self.on_thumbnail_ready
+        mark_startup_phase('services_started')
+        if tracer.enabled:
+            self._last_frame = time.perf_counter()
+            Clock.schedule_interval(self.check_frame_stall, 0) # Every frame
+            Clock.schedule_interval(lambda dt: core.background_service.submit(tracer.flush), TRACE_FLUSH_INTERVAL_SECONDS)
+        core.background_service.submit(load_all_data, callback=self.on_caches_loaded)
+
+    def on_caches_loaded(self, settings):
+        mark_startup_phase('caches_loaded')
+        save_startup_timings()
+        self.initial_load(0)
+
+    def load_app_state(self, load_caches=True):
+        settings = load_all_data(load_caches)
+        tracer.configure(settings.get('tracing') or os.environ.get(TRACE_ENV_VAR) == '1', os.path.join(core.app_data_dir, TRACE_FILE_NAME))
         self.current_language = settings.get('current_language', DEFAULT_CONTENT_LANG)
         self.downloaded_languages = settings.get('downloaded_languages', [])
         self.last_post_id = settings.get('last_post_id', None)
@@ -405,22 +487,81 @@ class CollepediaApp(MDApp):
         settings = {'current_language': self.current_language, 'downloaded_languages': self.downloaded_languages, 'last_post_id': self.last_post_id}
         save_settings(settings)
 
-    def run_background_kivy(self, dt):
-        threading.Thread(target=run_background_tasks_thread, daemon=True).start()
+    def start_background_sync(self):
+        # Started once the initial load is done, so the first scheduled sync never overlaps it
+        if self.sync_scheduler.next_run_at is None: self.sync_scheduler.start(core.sync_state.get('synced_at'))
+
+    def refresh_now(self):
+        if self.sync_scheduler.run_now(): self.show_snackbar("Checking for new articles...")
+        else: self.show_snackbar("Already checking for new articles.")
+
+    def check_frame_stall(self, dt):
+        now = time.perf_counter()
+        gap, self._last_frame = now - self._last_frame, now
+        if gap * 1000 >= FRAME_STALL_THRESHOLD_MS:
+            tracer.complete('main.frame_stall', tracer.now_us() - gap * 1e6, ms=round(gap * 1000, 1))
+            tracer.count('frame_stalls')
+
+    def flush_pending_writes(self, timeout=None):
+        # Unsaved settings and favorites are written on a worker, so pausing or closing never waits on disk in the UI thread
+        if not core.background_service: return persistence.flush()
+        future = core.background_service.submit(persistence.flush)
+        if timeout: future.result(timeout)
+
+    def on_pause(self):
+        self.sync_scheduler.set_foreground(False)
+        self.flush_pending_writes()
+        self.trim_caches('pause') # Smaller processes are killed last in the background
+        return True
+
+    def on_low_memory(self, *args):
+        for category in ('kv.image', 'kv.texture'): Cache.remove(category)
+        self.trim_caches('low_memory')
+
+    def trim_caches(self, reason):
+        # Before the background service is up little is loaded, so trimming inline is cheap
+        if not core.background_service: return cache_manager.trim(reason)
+        core.background_service.submit(cache_manager.trim, reason)
+
+    def show_debug_report(self):
+        core.background_service.submit(get_debug_report, callback=self.on_debug_report)
+
+    def on_debug_report(self, report):
+        lines = [f"{name}: {size / 2**20:.2f} MB" for name, size in sorted(report['caches'].items(), key=lambda item: -item[1])]
+        lines.append(f"Total {report['total'] / 2**20:.1f} MB of {report['budget'] / 2**20:.0f} MB; sheds {report['sheds'] or 'none'}")
+        for name, stats in report['stores'].items():
+            hits, misses = stats.get('hits', stats.get('fresh_hits', 0) + stats.get('revalidated', 0)), stats['misses']
+            lines.append(f"{name}: {stats['entries']} entries, {stats['bytes'] / 2**20:.1f} MB, {hits} hits / {misses} misses, {stats.get('evictions', 0)} evicted")
+        for name, stats in work_queue.get_stats().items():
+            if stats['jobs']: lines.append(f"{name}: {stats['jobs']} jobs, wait p95 {stats['wait_ms_p95']:.0f} ms, run p95 {stats['run_ms_p95']:.0f} ms, aged {stats['aged']}")
+        if self.dialog: self.dialog.dismiss()
+        self.dialog = MDDialog(title="Debug Report", text="\n".join(lines), buttons=[MDFlatButton(text="CLOSE", on_release=self.dismiss_dialog)])
+        self.dialog.open()
+
+    def on_resume(self):
+        self.sync_scheduler.set_foreground(True)
+
+    def on_stop(self):
+        self.sync_scheduler.stop()
+        try: self.flush_pending_writes(timeout=5) # Waited for, as the process may exit right after
+        except Exception as e: print(f"Error flushing pending writes: {e}")
+        tracer.flush()
+        if core.background_service: core.background_service.shutdown()
 
     def initial_load(self, dt):
-        if not base_cache:
+        if not core.base_cache:
             self.show_progress_dialog("Fetching initial articles...")
-            threading.Thread(target=self._initial_fetch_thread, daemon=True).start()
+            core.background_service.submit(fetch_base_cache_sync, callback=self.on_initial_fetch_complete, priority=PRIORITY_INTERACTIVE,
+                                      error_callback=lambda e: self.on_initial_fetch_complete(None))
         else:
             self.refresh_ui_lists()
+            self.start_background_sync()
 
-    def _initial_fetch_thread(self):
-        if fetch_base_cache_sync():
-            Clock.schedule_once(lambda dt: self.refresh_ui_lists())
-        else:
-            Clock.schedule_once(lambda dt: self.show_snackbar("Error: Could not load initial data."))
+    def on_initial_fetch_complete(self, new_posts):
         self.dismiss_dialog()
+        self.start_background_sync()
+        if new_posts: self.refresh_ui_lists()
+        else: self.show_snackbar("Error: Could not load initial data.")
 
     @mainthread
     def refresh_ui_lists(self):
@@ -429,83 +570,73 @@ class CollepediaApp(MDApp):
         self.populate_language_list()
 
     @mainthread
+    @traced('ui.populate_articles')
     def populate_article_list(self, list_widget=None):
         if not list_widget:
             try: list_widget = self.root.ids.screen_manager.get_screen('home').article_list_widget
             except Exception as e: print(f"Error getting list widget: {e}"); return
-        list_widget.clear_widgets()
-        
+        if not list_widget: return
+
         display_cache = get_list_display_cache(self.current_language)
         if not display_cache:
             msg = f"Language '{self.current_language}' not downloaded. Go to Settings." if self.current_language != DEFAULT_CONTENT_LANG else "No articles loaded yet. Try refreshing."
-            list_widget.add_widget(MDLabel(text=msg, halign='center', theme_text_color="Secondary", padding_y="20dp"))
+            list_widget.set_rows([make_empty_row(msg)], 0)
             return
 
-        for item_data in display_cache[:ARTICLES_PER_PAGE_IN_LIST]:
-            original_post = next((p for p in base_cache if p.get('id') == item_data.get('id')), item_data)
-            list_item = ArticleListItem(
-                text=item_data.get('title', 'No Title'),
-                secondary_text=(item_data.get('snippet', '') or '')[:120] + '...',
-                image_source=item_data.get('image_url', ''),
-                list_data=item_data, article_data=original_post
-            )
-            list_item.bind(on_release=self.open_article)
-            list_widget.add_widget(list_item)
-            
+        rows = [make_article_row(item_data, core.base_cache.get(item_data.get('id'), item_data))
+                for item_data in display_cache[:list_widget.row_limit]]
+        list_widget.set_rows(rows, len(display_cache))
+        if core.thumbnail_cache:
+            next_page = display_cache[list_widget.row_limit:list_widget.row_limit + ARTICLES_PER_PAGE_IN_LIST]
+            core.thumbnail_cache.prefetch([item.get('image_url') for item in next_page])
+
     @mainthread
+    @traced('ui.populate_favorites')
     def populate_favorites_list(self, list_widget=None):
         if not list_widget:
             try: list_widget = self.root.ids.screen_manager.get_screen('favorites').fav_list_widget
             except: return
-        list_widget.clear_widgets()
-        
+        if not list_widget: return
+
         favs_data = get_favorite_articles_sync(self.current_language)
-        
+
         if not favs_data:
-            list_widget.add_widget(MDLabel(text="No favorite articles saved yet.", halign='center', theme_text_color="Secondary", padding_y="20dp"))
+            list_widget.set_rows([make_empty_row("No favorite articles saved yet.")], 0)
             return
 
-        for item_data in favs_data:
-            list_item = ArticleListItem(
-                text=item_data.get('title', 'No Title'),
-                secondary_text=item_data.get('snippet', 'Saved Offline')[:120] + '...',
-                image_source=item_data.get('image_url', ''),
-                list_data=item_data, article_data=item_data
-            )
-            list_item.bind(on_release=self.open_article)
-            list_widget.add_widget(list_item)
-            
-    @mainthread
-    def populate_language_list(self, list_widget=None, filter_text=''):
-        if not list_widget:
-            try: list_widget = self.root.ids.screen_manager.get_screen('settings').language_list
-            except: return
-        list_widget.clear_widgets()
-        
-        filtered_langs = {code: name for code, name in ALL_LANGUAGES.items() if not filter_text or filter_text in code or filter_text in name.lower()}
+        rows = [make_article_row(item_data, item_data, 'Saved Offline') for item_data in favs_data[:list_widget.row_limit]]
+        list_widget.set_rows(rows, len(favs_data))
 
-        def sort_key(lang_tuple):
-            code, name = lang_tuple
-            if code == self.current_language: return (0, name)
-            if code in self.downloaded_languages or code == DEFAULT_CONTENT_LANG: return (1, name)
-            return (2, name)
+    @mainthread
+    def on_thumbnail_ready(self, url):
+        self._refresh_thumbnails_trigger() # Coalesces a burst of finished downloads into one refresh
 
-        sorted_langs = sorted(filtered_langs.items(), key=sort_key)
+    def refresh_article_rows(self, *args):
+        # Row diffing in set_rows means only rows whose thumbnail changed get refreshed
+        self.populate_article_list()
+        self.populate_favorites_list()
 
-        for lang_code, lang_name in sorted_langs:
+    @mainthread
+    @traced('ui.populate_languages')
+    def populate_language_list(self, list_widget=None, filter_text=None):
+        settings_screen = self.root.ids.screen_manager.get_screen('settings')
+        list_widget = list_widget or settings_screen.language_list
+        if not list_widget: return
+        if filter_text is None: filter_text = settings_screen.filter_field.text # Keep the user's filter across state changes
+
+        # The model is already sorted by name, so grouping active / downloaded / other is a single stable pass
+        groups = ([], [], [])
+        for lang_code, lang_name, _ in get_language_model().filter(filter_text):
             is_downloaded = lang_code in self.downloaded_languages
             is_active = self.current_language == lang_code
             is_base = lang_code == DEFAULT_CONTENT_LANG
             can_download = lang_code in ACTIVE_TRANSLATION_LANGUAGES and not is_downloaded and not is_base
             can_delete = is_downloaded and not is_base
             status = "Active" if is_active else ("Base" if is_base else ("Downloaded" if is_downloaded else "Available"))
-
-            item = LanguageListItem(
-                lang_code=lang_code, lang_name=lang_name, text=lang_name,
-                status_text=status, is_active=is_active, is_downloaded=is_downloaded,
-                can_download=can_download, can_delete=can_delete
-            )
-            list_widget.add_widget(item)
+            groups[0 if is_active else (1 if is_downloaded or is_base else 2)].append(
+                {'lang_code': lang_code, 'lang_name': lang_name, 'text': lang_name, 'status_text': status, 'is_active': is_active,
+                 'is_downloaded': is_downloaded, 'can_download': can_download, 'can_delete': can_delete})
+        list_widget.set_rows(groups[0] + groups[1] + groups[2])
 
     def handle_language_download_delete(self, lang_code, is_downloaded):
          if is_downloaded: self.delete_language(lang_code)
@@ -538,31 +669,51 @@ class CollepediaApp(MDApp):
         if lang_code not in ACTIVE_TRANSLATION_LANGUAGES:
             self.show_snackbar(f"Automated translation for {lang_code.upper()} is not enabled.")
             return
-        self.show_progress_dialog(f"Preparing language pack {lang_code.upper()}...")
-        threading.Thread(target=download_language_thread,
-                         args=(lang_code, self.update_progress, self.on_language_download_complete),
-                         daemon=True).start()
+        self.download_languages([lang_code])
+
+    def open_language_picker(self):
+        available = [(lang_code, ALL_LANGUAGES.get(lang_code, lang_code)) for lang_code in ACTIVE_TRANSLATION_LANGUAGES
+                     if lang_code not in self.downloaded_languages and lang_code != DEFAULT_CONTENT_LANG]
+        if not available:
+            self.show_snackbar("All translatable languages are already downloaded.")
+            return
+        if self.dialog: self.dialog.dismiss()
+        content = LanguagePickerContent(available)
+        self.dialog = MDDialog(title="Download languages", type="custom", content_cls=content, buttons=[
+            MDFlatButton(text="CANCEL", on_release=self.dismiss_dialog),
+            MDFlatButton(text="DOWNLOAD", on_release=lambda x: self.download_languages(content.selected()))])
+        self.dialog.open()
+
+    def download_languages(self, lang_codes):
+        # Any number of packs in one pass; each becomes selectable as soon as it is saved
+        if not lang_codes: return self.dismiss_dialog()
+        self.show_progress_dialog(f"Preparing language packs {', '.join(lang_code.upper() for lang_code in lang_codes)}...")
+        core.background_service.submit(partial(download_languages_thread, pack_callback=self.on_language_pack_ready), lang_codes, self.update_progress,
+                                       partial(self.on_languages_download_complete, lang_codes), priority=PRIORITY_USER)
 
     @mainthread
     def update_progress(self, text):
-        if self.dialog and hasattr(self.dialog, 'title'): self.dialog.title = text
+        if self.dialog and hasattr(self.dialog, 'status_text'): self.dialog.status_text = text
+
+    @mainthread
+    def on_language_pack_ready(self, lang_code):
+        if lang_code in self.downloaded_languages: return
+        self.downloaded_languages = self.downloaded_languages + [lang_code]
+        self.save_app_state()
+        self.populate_language_list()
 
     @mainthread
-    def on_language_download_complete(self, success, message):
+    def on_languages_download_complete(self, lang_codes, downloaded, errors):
         self.dismiss_dialog()
-        if success:
-            lang_code = message.split(" ")[1]
-            self.downloaded_languages = list(set(self.downloaded_languages + [lang_code]))
-            self.save_app_state()
-            self.populate_language_list()
-            self.select_language(lang_code)
-            self.show_snackbar(message)
-        else:
-            self.show_snackbar(f"Error: {message}")
+        if len(lang_codes) == 1 and downloaded: self.select_language(downloaded[0])
+        message = f"Downloaded {', '.join(lang_code.upper() for lang_code in downloaded)}." if downloaded else ""
+        if errors: message = f"{message} Error: {'; '.join(errors.values())}".strip()
+        self.show_snackbar(message)
 
     def open_article(self, list_item):
         self.current_article = list_item.article_data
         if not self.current_article: return
+        if self.search_dialog: self.search_dialog.dismiss()
         
         self.switch_screen('article')
         article_screen = self.root.ids.screen_manager.get_screen('article')
@@ -577,32 +728,51 @@ class CollepediaApp(MDApp):
 
         display_title = list_item.list_data.get('title', 'Loading...')
 
-        article_screen.update_content(display_title, "<i>Loading full article content...</i>", is_fav)
-        
-        threading.Thread(target=self._load_article_content_thread,
-                         args=(self.current_article, display_lang, is_offline),
-                         daemon=True).start()
+        article_screen.update_content(display_title, "<i>Loading full article content...</i>", is_fav, reset_scroll=True)
 
-    def _load_article_content_thread(self, article_data, lang, force_offline=False):
+        if self.article_future: self.article_future.cancel() # The previous article's fetch is no longer wanted
+        self.article_generation += 1
+        generation = self.article_generation
+        self.article_future = core.background_service.submit(
+            self._load_article_content(self.current_article, display_lang, is_offline, generation),
+            callback=lambda result: self.on_article_loaded(generation, result),
+            error_callback=lambda e: self.on_article_loaded(generation, ("Error", f"Could not load article: {e}", is_fav)), priority=PRIORITY_INTERACTIVE)
+
+    def on_article_loaded(self, generation, result):
+        if generation != self.article_generation: return # A newer article was opened in the meantime
+        self.root.ids.screen_manager.get_screen('article').update_content(*result)
+
+    @mainthread
+    def on_article_progress(self, generation, result):
+        self.on_article_loaded(generation, result)
+
+    async def _load_article_content(self, article_data, lang, force_offline=False, generation=None):
+        # Runs on the background loop; returns update_content arguments
         url = article_data.get('link')
         is_fav = is_favorite_sync(url, lang)
-        
-        offline_content = load_offline_article_sync(url, lang)
-        
-        if offline_content and (force_offline or is_fav):
+
+        offline_content = await core.background_service.run_blocking(load_offline_article_sync, url, lang)
+
+        if offline_content: # Favorites and prefetched articles open without a network round trip
             print(f"Loading offline article: {url} ({lang})")
-            title = translate_sync(article_data.get('title'), lang)
-            Clock.schedule_once(lambda dt: self.root.ids.screen_manager.get_screen('article').update_content(title, offline_content, is_fav))
-            return
+            title = await core.background_service.run_queued('article.title', translate_sync, article_data.get('title'), lang)
+            return title, offline_content, is_fav, False
 
         print(f"Fetching online article: {url} for lang {lang}")
-        try:
-            full_content_data = asyncio.run(get_full_article_content_async(url)) # Use async version
-            translated_content = translate_sync(full_content_data.get('html_content'), lang)
-            title = translate_sync(article_data.get('title'), lang)
-            Clock.schedule_once(lambda dt: self.root.ids.screen_manager.get_screen('article').update_content(title, translated_content, is_fav))
-        except Exception as e:
-            Clock.schedule_once(lambda dt: self.root.ids.screen_manager.get_screen('article').update_content("Error", f"Could not load article: {e}", is_fav))
+        title = await core.background_service.run_queued('article.title', translate_sync, article_data.get('title'), lang)
+        shown = [0]
+        def show_translated_prefix(chunks):
+            # Paragraphs are shown in order as soon as every one before them has arrived
+            ready = 0
+            while ready < len(chunks) and chunks[ready] is not None: ready += 1
+            if ready <= shown[0] or ready == len(chunks): return
+            shown[0] = ready
+            partial_html = ''.join(chunks[:ready]) + "<p><i>Translating...</i></p>"
+            self.on_article_progress(generation, (title, partial_html, is_fav, False))
+        full_content_data, translated_content = await get_translated_article_async(url, lang, show_translated_prefix)
+        if lang == DEFAULT_CONTENT_LANG: # The extractor already rendered markup for the untranslated body
+            return title, full_content_data.get('markup', ''), is_fav, True
+        return title, translated_content, is_fav, False
 
     def toggle_favorite(self):
         if not self.current_article: return
@@ -615,27 +785,75 @@ class CollepediaApp(MDApp):
                 self.root.ids.screen_manager.get_screen('article').toolbar.right_action_items = [["heart-outline", lambda x: self.toggle_favorite()]]
         else:
              self.show_progress_dialog(f"Saving article to Favorites ({lang.upper()})...")
-             threading.Thread(target=self._save_and_add_favorite_thread, args=(url, lang), daemon=True).start()
-
-    def _save_and_add_favorite_thread(self, url, lang):
-         save_article_offline_sync(url, lang, self.update_progress, self.on_save_for_favorite_complete)
+             core.background_service.submit(save_article_offline_async(url, lang, self.update_progress, partial(self.on_save_for_favorite_complete, url, lang)),
+                                            priority=PRIORITY_USER)
 
     @mainthread
-    def on_save_for_favorite_complete(self, success, message):
+    def on_save_for_favorite_complete(self, url, lang, success, message):
+         # url/lang are bound at submit time: the user may have opened another article since
          self.dismiss_dialog()
          if success:
-             url = self.current_article.get('link')
-             lang = self.current_language
              if add_favorite_sync(url, lang):
                  self.show_snackbar("Article saved offline & added to Favorites!")
-                 self.root.ids.screen_manager.get_screen('article').toolbar.right_action_items = [["heart", lambda x: self.toggle_favorite()]]
+                 if self.current_article and self.current_article.get('link') == url:
+                     self.root.ids.screen_manager.get_screen('article').toolbar.right_action_items = [["heart", lambda x: self.toggle_favorite()]]
          else:
              self.show_snackbar(f"Error saving article for favorite: {message}")
 
+    def toggle_offline_prefetch(self):
+        if self.prefetch_future and not self.prefetch_future.done():
+            self.prefetch_job.cancel()
+            self.prefetch_future.cancel()
+            self.prefetch_status = "Resume Offline Download"
+            self.show_snackbar("Offline download paused.")
+            return
+        checkpoint_path = os.path.join(core.app_data_dir, PREFETCH_CHECKPOINT_FILE_NAME)
+        job = resume_offline_prefetch_job(checkpoint_path, progress_callback=self.on_prefetch_progress)
+        if job is None:
+            display_cache = get_list_display_cache(self.current_language) or []
+            favorite_items = [(fav.get('url'), fav.get('lang')) for fav in core.favorites.values()]
+            top_items = [(post.get('link'), self.current_language) for post in display_cache[:PREFETCH_TOP_ARTICLES]]
+            job = OfflinePrefetchJob(favorite_items + top_items, checkpoint_path, refresh=favorite_items, progress_callback=self.on_prefetch_progress)
+        self.prefetch_job = job
+        self.prefetch_status = f"Preparing {len(job.items)} articles... (tap to pause)"
+        self.prefetch_future = core.background_service.submit(job.run(), callback=self.on_prefetch_complete, priority=PRIORITY_PREFETCH,
+                                                         error_callback=lambda e: self.on_prefetch_complete({'error': e}))
+
+    @mainthread
+    def on_prefetch_progress(self, stats):
+        if not self.prefetch_future or self.prefetch_future.done(): return
+        self.prefetch_status = (f"Offline: {stats['done']}/{stats['total']}, {stats['bytes'] / 1e6:.1f} MB, "
+                                f"{stats['articles_per_second']:.1f}/s (tap to pause)")
+
+    def on_prefetch_complete(self, stats):
+        if stats.get('error'):
+            self.prefetch_status = "Resume Offline Download"
+            self.show_snackbar(f"Offline download stopped: {stats['error']}")
+            return
+        self.prefetch_status = "Make Articles Available Offline"
+        budget_note = " Storage budget reached." if stats['stop_reason'] == 'budget' else ""
+        self.show_snackbar(f"{stats['fetched']} articles saved ({stats['bytes'] / 1e6:.1f} MB, {stats['articles_per_second']:.1f}/s), "
+                           f"{stats['failed']} failed.{budget_note}")
+        self.populate_favorites_list()
+
     def clear_offline_cache(self):
-         success, message = clear_offline_articles_sync()
-         self.show_snackbar(message)
-         self.populate_favorites_list()
+        if self.dialog: self.dialog.dismiss()
+        lang = self.current_language
+        self.dialog = MDDialog(title="Clear offline articles", text="Favorites stay in your list, but their offline copies are deleted too; they load from the network until downloaded again.", buttons=[
+            MDFlatButton(text=f"OLDER THAN {OFFLINE_CLEAR_AGE_DAYS} DAYS", on_release=lambda x: self.run_clear_offline(None, OFFLINE_CLEAR_AGE_DAYS)),
+            MDFlatButton(text=f"ONLY {lang.upper()}", on_release=lambda x: self.run_clear_offline(lang, None)),
+            MDFlatButton(text="ALL", on_release=lambda x: self.run_clear_offline(None, None)),
+            MDFlatButton(text="CANCEL", on_release=self.dismiss_dialog)])
+        self.dialog.open()
+
+    def run_clear_offline(self, lang, older_than_days):
+        self.dismiss_dialog()
+        core.background_service.submit(clear_offline_articles_sync, lang, older_than_days, callback=self.on_offline_cleared)
+
+    def on_offline_cleared(self, result):
+        success, message = result
+        self.show_snackbar(message)
+        self.populate_favorites_list()
 
     def switch_screen(self, screen_name):
         self.root.ids.screen_manager.current = screen_name
@@ -653,14 +871,15 @@ class CollepediaApp(MDApp):
     def send_notification(self, post):
          lang = self.current_language
          title = translate_sync(post.get('title', 'New Article'), lang)
-         try: notification.notify(title=f"New Collepedia Article", message=title, app_name=APP_NAME)
+         try:
+             from plyer import notification
+             notification.notify(title="New Collepedia Article", message=title, app_name=APP_NAME)
          except Exception as e: print(f"Failed to send notification: {e}")
 
     @mainthread
     def show_progress_dialog(self, text):
         if self.dialog: self.dialog.dismiss()
-        self.dialog = LoadingSpinnerPopup() # Use the KV definition
-        # How to set title on ModalView? KivyMD Dialog might be better if title needed
+        self.dialog = LoadingSpinnerPopup(status_text=text) # Use the KV definition
         self.dialog.open()
 
     @mainthread
@@ -672,7 +891,43 @@ class CollepediaApp(MDApp):
         Snackbar(text=text, duration=2.5).open()
 
     def show_about_dialog(self): pass
-    def open_search_dialog(self): pass
+
+    def open_search_dialog(self):
+        if not self.search_dialog:
+            self.search_dialog = MDDialog(title="Search", type="custom", content_cls=SearchDialogContent(),
+                                          buttons=[MDFlatButton(text="CLOSE", on_release=lambda x: self.search_dialog.dismiss())])
+        self.search_dialog.open()
+        self.run_search()
+
+    def on_search_text(self, text):
+        self.search_query = text
+        self._search_trigger() # Debounced: only the last keystroke in a burst runs a query
+
+    def run_search(self, *args):
+        self.search_generation += 1
+        query = self.search_query.strip()
+        if not query:
+            self.show_search_results(self.search_generation, self.current_language, [])
+            return
+        generation, lang = self.search_generation, self.current_language
+        core.background_service.submit(search_articles_sync, self.search_query, lang,
+                                  callback=partial(self.show_search_results, generation, lang),
+                                  error_callback=lambda e: print(f"Search error: {e}"))
+
+    def show_search_results(self, generation, lang, results):
+        if generation != self.search_generation or not self.search_dialog: return
+        list_widget = self.search_dialog.content_cls.ids.results
+        if not results:
+            message = "No matching articles." if self.search_query.strip() else "Type to search offline articles."
+            list_widget.set_rows([make_empty_row(message)], 0)
+            return
+        rows = []
+        for item in results:
+            list_data = dict(item, lang=lang, is_offline=True) if is_favorite_sync(item.get('link'), lang) else item
+            rows.append(make_article_row(list_data, core.base_cache.get(item.get('id')) or item))
+        list_widget.set_rows(rows, len(rows))
+
+mark_startup_phase('module_loaded')
 
 if __name__ == '__main__':
     CollepediaApp().run()
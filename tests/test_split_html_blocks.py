@@ -0,0 +1,49 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import split_html_blocks, TRANSLATE_CHUNK_MAX_CHARS, TRANSLATE_BATCH_MAX_CHARS
+
+def visible_text(html_content):
+    return re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', '', html_content)).strip()
+
+def assert_balanced(chunk):
+    for tag in ('div', 'p', 'span', 'b', 'a'):
+        assert len(re.findall(fr'<{tag}[\s>]', chunk)) == chunk.count(f'</{tag}>'), (tag, chunk[:200])
+
+def test_styled_runs_without_block_breaks_stay_under_the_limit():
+    # Blogger posts often hold one paragraph of styled spans: nothing to cut at but the inline runs
+    run = '<span style="font-family: &quot;Helvetica Neue&quot;, Arial, sans-serif; font-size: 14px;">Some words of the article, {}. </span>'
+    html = '<div dir="ltr" style="text-align: left;"><p style="margin: 0px;">' + ''.join(run.format(i) for i in range(800)) + '</p></div>'
+    chunks = split_html_blocks(html)
+    assert len(chunks) > 1
+    assert max(map(len, chunks)) <= TRANSLATE_CHUNK_MAX_CHARS
+    for chunk in chunks: assert_balanced(chunk)
+    assert visible_text(' '.join(chunks)) == visible_text(html)
+
+def test_plain_text_stays_under_the_limit():
+    html = '<p>' + 'word ' * 5000 + '</p>'
+    chunks = split_html_blocks(html)
+    assert max(map(len, chunks)) <= TRANSLATE_CHUNK_MAX_CHARS
+    assert visible_text(' '.join(chunks)) == visible_text(html)
+
+def test_chunks_fit_the_translate_get_request():
+    # Arabic URL-encodes to about six bytes a character, so chunks are held to the batch cap of the GET endpoint
+    html = '<p dir="rtl">' + 'نص المقالة باللغة العربية ' * 400 + '</p>'
+    chunks = split_html_blocks(html)
+    assert max(map(len, chunks)) <= TRANSLATE_BATCH_MAX_CHARS
+    assert visible_text(' '.join(chunks)) == visible_text(html)
+
+def test_nested_inline_markup_is_reopened_in_every_chunk():
+    html = '<div><b><a href="http://example.com/x">' + 'linked text ' * 1500 + '</a></b></div>'
+    chunks = split_html_blocks(html, max_chars=1000)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk) <= 1000
+        assert chunk.startswith('<div><b><a href="http://example.com/x">') and chunk.endswith('</a></b></div>')
+
+def test_short_article_is_one_chunk():
+    html = '<p>Hello <b>world</b>.</p>'
+    assert split_html_blocks(html) == [html]